@@ -1,6 +1,6 @@
 from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton
 from telegram.ext import ContextTypes
-import database
+import async_database
 
 # State tracking for log channel input {admin_id: {"phone": str}}
 log_channel_states = {}
@@ -136,10 +136,10 @@ async def save_log_channel(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
 
         # Update database
-        success = database.update_user_log_channel(phone, log_channel_id)
+        success = await async_database.update_user_log_channel(phone, log_channel_id)
 
         if success:
-            user = database.get_user_by_phone(phone)
+            user = await async_database.get_user_by_phone(phone)
             if user:
                 # Import and call show_user_details directly with a new message approach
                 from user_manage import show_user_details_text, get_user_details_keyboard
@@ -199,10 +199,10 @@ async def save_log_channel(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def remove_log_channel(update: Update, context: ContextTypes.DEFAULT_TYPE, phone: str):
     """Remove log channel for a user"""
     try:
-        success = database.update_user_log_channel(phone, None)
+        success = await async_database.update_user_log_channel(phone, None)
 
         if success:
-            user = database.get_user_by_phone(phone)
+            user = await async_database.get_user_by_phone(phone)
             if user:
                 # Import helper functions instead of trying to call show_user_details
                 from user_manage import show_user_details_text, get_user_details_keyboard
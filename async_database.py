@@ -0,0 +1,108 @@
+# ================== ASYNC_DATABASE.PY ==================
+# Awaitable versions of the database.py functions, under the same names.
+# Queries run on a dedicated thread pool so a slow MySQL round trip never
+# stalls the event loop that also drives the bot and every Telethon client.
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+import database
+from config import DB_EXECUTOR_WORKERS
+
+_executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix="db")
+
+
+async def run(func, *args, **kwargs):
+    """Run any blocking DB helper on the DB executor and await its result"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+
+def _offload(func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run(func, *args, **kwargs)
+    return wrapper
+
+
+# =============================
+# Schema / Maintenance
+# =============================
+init_db = _offload(database.init_db)
+reset_database = _offload(database.reset_database)
+optimize_database = _offload(database.optimize_database)
+backup_database = _offload(database.backup_database)
+test_connection = _offload(database.test_connection)
+get_database_info = _offload(database.get_database_info)
+get_database_stats = _offload(database.get_database_stats)
+cleanup_expired_users = _offload(database.cleanup_expired_users)
+
+# =============================
+# Users
+# =============================
+add_user = _offload(database.add_user)
+delete_user = _offload(database.delete_user)
+user_exists = _offload(database.user_exists)
+get_user_by_phone = _offload(database.get_user_by_phone)
+get_user_by_id = _offload(database.get_user_by_id)
+get_all_users = _offload(database.get_all_users)
+get_all_users_full = _offload(database.get_all_users_full)
+get_user_count = _offload(database.get_user_count)
+get_expired_users = _offload(database.get_expired_users)
+get_active_users = _offload(database.get_active_users)
+get_users_with_forwarding_enabled = _offload(database.get_users_with_forwarding_enabled)
+get_users_changed_since = _offload(database.get_users_changed_since)
+get_user_phone_batch = _offload(database.get_user_phone_batch)
+
+update_user_urls = _offload(database.update_user_urls)
+set_forwarding = _offload(database.set_forwarding)
+update_user_delay = _offload(database.update_user_delay)
+update_user_forward_mode = _offload(database.update_user_forward_mode)
+update_user_repost_interval = _offload(database.update_user_repost_interval)
+update_user_content_mode = _offload(database.update_user_content_mode)
+update_user_expiry_days = _offload(database.update_user_expiry_days)
+update_user_expiry_date = _offload(database.update_user_expiry_date)
+update_user_log_channel = _offload(database.update_user_log_channel)
+update_user_api_credentials = _offload(database.update_user_api_credentials)
+
+# =============================
+# Forwarder State
+# =============================
+get_user_targets = _offload(database.get_user_targets)
+add_user_targets = _offload(database.add_user_targets)
+delete_user_target = _offload(database.delete_user_target)
+get_target_health = _offload(database.get_target_health)
+save_target_health = _offload(database.save_target_health)
+get_resolved_peers = _offload(database.get_resolved_peers)
+save_resolved_peers = _offload(database.save_resolved_peers)
+
+
+async def iter_users_changed_since(since=None, batch_size=1000):
+    """Async version of database.iter_users_changed_since (one executor hop per batch)"""
+    after = None
+    while True:
+        rows = await get_users_changed_since(since, after, batch_size)
+        if not rows:
+            return
+        yield rows
+        if len(rows) < batch_size:
+            return
+        after = (rows[-1]['updated_at'], rows[-1]['id'])
+
+
+async def iter_user_phones(batch_size=1000):
+    """Async version of database.iter_user_phones (one executor hop per batch)"""
+    after_id = 0
+    while True:
+        batch = await get_user_phone_batch(after_id, batch_size)
+        if not batch:
+            return
+        yield batch
+        if len(batch) < batch_size:
+            return
+        after_id = batch[-1][0]
+
+
+# Pool and cache statistics are in-memory and never block
+get_pool_stats = database.get_pool_stats
+get_user_cache_stats = database.get_user_cache_stats
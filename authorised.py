@@ -6,7 +6,7 @@ from telethon import TelegramClient
 from telethon.errors import SessionPasswordNeededError
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
-from database import add_user, update_user_delay, get_db_cursor, db_lock
+from async_database import add_user, update_user_delay
 
 # ================== TEMPORARY STATE STORAGE ==================
 user_states = {}
@@ -247,7 +247,7 @@ async def handle_user_input(update: Update, context: ContextTypes.DEFAULT_TYPE,
                 data = user_states[user_id]["data"]
 
                 # Save user into MySQL DB
-                add_user(data["api_id"], data["api_hash"], data["mobile"])
+                await add_user(data["api_id"], data["api_hash"], data["mobile"])
 
                 # Next step: URLs
                 user_states[user_id]["step"] = "urls"
@@ -303,9 +303,9 @@ async def handle_user_input(update: Update, context: ContextTypes.DEFAULT_TYPE,
                 return
 
             try:
-                from database import update_user_urls
+                from async_database import update_user_urls
                 mobile = user_states[user_id]["data"]["mobile"]
-                update_user_urls(mobile, validated_urls)
+                await update_user_urls(mobile, validated_urls)
 
                 user_states[user_id]["step"] = "delay"
 
@@ -346,7 +346,7 @@ async def handle_user_input(update: Update, context: ContextTypes.DEFAULT_TYPE,
                 mobile = user_states[user_id]["data"]["mobile"]
 
                 # Update delay in MySQL DB using the imported function
-                success = update_user_delay(mobile, delay)
+                success = await update_user_delay(mobile, delay)
                 
                 if not success:
                     raise Exception("Failed to update delay in database")
@@ -412,10 +412,10 @@ async def handle_forwarding(update: Update, context: ContextTypes.DEFAULT_TYPE,
 
     try:
         mobile = user_states[user_id]["data"]["mobile"]
-        from database import set_forwarding
+        from async_database import set_forwarding
 
         if query.data == "forward_start":
-            success = set_forwarding(mobile, True)
+            success = await set_forwarding(mobile, True)
             if success:
                 await query.edit_message_caption(
                     caption="✅ Auto Forwarding started successfully!\n\n🏠 Returning to main menu...",
@@ -430,7 +430,7 @@ async def handle_forwarding(update: Update, context: ContextTypes.DEFAULT_TYPE,
                 )
 
         elif query.data == "forward_skip":
-            success = set_forwarding(mobile, False)
+            success = await set_forwarding(mobile, False)
             if success:
                 await query.edit_message_caption(
                     caption="⏭️ Skipped. Auto Forwarding is disabled.\n\n🏠 Returning to main menu...",
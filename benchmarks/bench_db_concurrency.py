@@ -0,0 +1,64 @@
+# ================== BENCH_DB_CONCURRENCY.PY ==================
+# Throughput of the DB layer with 8 concurrent callers: every call behind one
+# process-wide lock (the old db_lock) vs. independent pooled connections.
+# Needs the MySQL server from database.DB_CONFIG.
+# Run from the repository root: python benchmarks/bench_db_concurrency.py
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+
+CALLERS = 8
+CALLS_PER_CALLER = 50
+
+
+def query():
+    """A typical admin/supervisor read"""
+    database.get_user_count()
+    database.get_all_users(0, 10)
+
+
+def run(callers, call):
+    def caller():
+        for _ in range(CALLS_PER_CALLER):
+            call()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=callers) as executor:
+        for future in [executor.submit(caller) for _ in range(callers)]:
+            future.result()
+    return callers * CALLS_PER_CALLER / (time.perf_counter() - started)
+
+
+def main():
+    if not database.test_connection():
+        print("❌ MySQL is not reachable, nothing to measure")
+        return
+
+    global_lock = threading.Lock()
+
+    def serialized():
+        with global_lock:
+            query()
+
+    # Warm the pool so both runs start from the same connections
+    run(CALLERS, query)
+
+    single = run(1, query)
+    locked = run(CALLERS, serialized)
+    concurrent = run(CALLERS, query)
+
+    print(f"📊 {CALLERS} callers x {CALLS_PER_CALLER} calls, pool size {database.DB_POOL_SIZE}")
+    print(f"  1 caller                : {single:8.1f} calls/s")
+    print(f"  {CALLERS} callers, global lock : {locked:8.1f} calls/s")
+    print(f"  {CALLERS} callers, pooled      : {concurrent:8.1f} calls/s  ({concurrent / locked:.1f}x)")
+    print(f"  pool: {database.get_pool_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# ================== BENCH_PARSE_TARGETS.PY ==================
+# Micro-benchmark: per-loop regex parsing vs. a Target table compiled once.
+# Run from the repository root: python benchmarks/bench_parse_targets.py
+import os
+import random
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from targets import compile_targets, parse_telegram_url  # noqa: E402
+
+URL_COUNT = 10_000
+LOOPS = 5
+
+
+def legacy_parse_telegram_url(url):
+    """The previous forwarder implementation: pattern list rebuilt, uncompiled re.match"""
+    try:
+        url = url.strip()
+        patterns = [
+            (r"https?://t\.me/c/(-?\d+)/(\d+)/?$", "private_topic"),
+            (r"https?://t\.me/c/(-?\d+)/?$", "private_channel"),
+            (r"https?://t\.me/([^/c][^/]+)/(\d+)/?$", "public_topic"),
+            (r"https?://t\.me/([^/c][^/]+)/?$", "public"),
+            (r"^@([^/]+)/?$", "username"),
+            (r"^(-?\d+)$", "chat_id"),
+        ]
+        for pattern, url_type in patterns:
+            match = re.match(pattern, url)
+            if match:
+                if url_type == "private_topic":
+                    chat_id = int(match.group(1))
+                    if chat_id > 0:
+                        chat_id = int("-100" + str(chat_id))
+                    topic_id = int(match.group(2))
+                    return str(chat_id), topic_id, url_type, chat_id
+                elif url_type == "private_channel":
+                    chat_id = int(match.group(1))
+                    if chat_id > 0:
+                        chat_id = int("-100" + str(chat_id))
+                    return str(chat_id), None, url_type, chat_id
+                elif url_type == "public_topic":
+                    username = match.group(1)
+                    topic_id = int(match.group(2))
+                    return username, topic_id, url_type, None
+                elif url_type in ["public", "username"]:
+                    username = match.group(1)
+                    return username, None, url_type, None
+                elif url_type == "chat_id":
+                    chat_id = int(match.group(1))
+                    return str(chat_id), None, url_type, chat_id
+        return url, None, "unknown", None
+    except Exception:
+        return url, None, "unknown", None
+
+
+def make_urls(count, seed=42):
+    rng = random.Random(seed)
+    makers = [
+        lambda: f"https://t.me/c/{rng.randint(10**9, 10**10)}/{rng.randint(1, 9999)}",
+        lambda: f"https://t.me/c/{rng.randint(10**9, 10**10)}",
+        lambda: f"https://t.me/group{rng.randint(1, 10**6)}/{rng.randint(1, 9999)}",
+        lambda: f"https://t.me/group{rng.randint(1, 10**6)}",
+        lambda: f"@user{rng.randint(1, 10**6)}",
+        lambda: f"-100{rng.randint(10**9, 10**10)}",
+    ]
+    return [rng.choice(makers)() for _ in range(count)]
+
+
+def main():
+    urls = make_urls(URL_COUNT)
+
+    # Same results as before the change
+    assert [legacy_parse_telegram_url(u) for u in urls] == [parse_telegram_url(u) for u in urls]
+
+    def legacy_loop():
+        for url in urls:
+            legacy_parse_telegram_url(url)
+
+    targets = compile_targets(urls)
+
+    def compiled_loop():
+        for target in targets:
+            target.identifier, target.topic_id, target.url_type, target.chat_id
+
+    legacy = min(timeit.repeat(legacy_loop, number=1, repeat=LOOPS))
+    parse = min(timeit.repeat(lambda: [parse_telegram_url(u) for u in urls], number=1, repeat=LOOPS))
+    build = min(timeit.repeat(lambda: compile_targets(urls), number=1, repeat=LOOPS))
+    compiled = min(timeit.repeat(compiled_loop, number=1, repeat=LOOPS))
+
+    print(f"📊 {URL_COUNT} URLs, best of {LOOPS}")
+    print(f"  legacy parse per loop   : {legacy * 1000:8.2f} ms")
+    print(f"  compiled-regex parse    : {parse * 1000:8.2f} ms")
+    print(f"  build Target table once : {build * 1000:8.2f} ms")
+    print(f"  iterate Target table    : {compiled * 1000:8.2f} ms  ({legacy / compiled:.0f}x faster per loop)")
+
+
+if __name__ == "__main__":
+    main()
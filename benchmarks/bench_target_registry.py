@@ -0,0 +1,74 @@
+# ================== BENCH_TARGET_REGISTRY.PY ==================
+# Fairness and utilisation of forwarder.TargetRegistry on one shared target
+# over simulated hours: accounts with very different delays, a slow account
+# arriving late and an account that stops asking. Every account that keeps
+# asking must get slots, the group must stay close to its hourly cap and
+# never exceed it.
+# Run from the repository root: python benchmarks/bench_target_registry.py
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from forwarder import TargetRegistry  # noqa: E402
+
+GROUP = "shared"
+MIN_GAP = 300
+HOURLY_CAP = 6
+
+# name -> (hours, {phone: (first ask, delay, number of asks or None for unlimited)})
+SCENARIOS = {
+    "60s vs 600s, fast first": (6, {"A": (1, 60, None), "B": (2, 600, None)}),
+    "60s vs 600s, slow first": (6, {"B": (1, 600, None), "A": (2, 60, None)}),
+    "60s vs 1h, slow arrives late": (6, {"A": (1, 60, None), "B": (100, 3600, None)}),
+    "60s vs 6h, slow arrives late": (12, {"A": (1, 60, None), "B": (100, 6 * 3600, None)}),
+    "60s vs one that stops asking": (6, {"A": (1, 60, None), "C": (100, 600, 1)}),
+}
+
+
+def simulate(accounts, hours):
+    registry = TargetRegistry(min_gap=MIN_GAP, hourly_cap=HOURLY_CAP)
+    for phone, (_, delay, _) in accounts.items():
+        registry.register(phone, {GROUP}, delay=delay)
+
+    slots = {phone: 0 for phone in accounts}
+    next_ask = {phone: first for phone, (first, _, _) in accounts.items()}
+    asks_left = {phone: asks for phone, (_, _, asks) in accounts.items()}
+    sent = []
+    end = hours * 3600
+    while next_ask:
+        phone = min(next_ask, key=next_ask.get)
+        now = next_ask[phone]
+        if now > end:
+            break
+        if registry.acquire(GROUP, phone, now=now) is not None:
+            slots[phone] += 1
+            sent.append(now)
+        if asks_left[phone] is not None:
+            asks_left[phone] -= 1
+            if not asks_left[phone]:
+                del next_ask[phone]
+                continue
+        next_ask[phone] = now + accounts[phone][1]
+    return slots, sent
+
+
+def main():
+    print(f"📊 min gap {MIN_GAP}s, cap {HOURLY_CAP}/h")
+    for name, (hours, accounts) in SCENARIOS.items():
+        slots, sent = simulate(accounts, hours)
+        cap = hours * HOURLY_CAP
+        print(f"  {name} ({hours} h): {slots} -> {len(sent)}/{cap} forwards")
+
+        assert all(later - earlier >= MIN_GAP for earlier, later in zip(sent, sent[1:])), "min gap violated"
+        assert all(
+            sum(1 for other in sent if t - 3600 < other <= t) <= HOURLY_CAP for t in sent
+        ), "hourly cap exceeded"
+        assert len(sent) >= 0.8 * cap, "shared target left idle"
+        for phone, (_, _, asks) in accounts.items():
+            if asks is None:
+                assert slots[phone], f"{phone} was starved"
+
+
+if __name__ == "__main__":
+    main()
@@ -4,4 +4,125 @@ PRIMARY_ADMIN = 5109156071
 ADMIN_LOG_CHANNEL = -1002917245810
 SECONDARY_ADMIN = None
 WELCOME_IMAGE = "https://cinetoon.rf.gd/welcome.png"
-ITEMS_PER_PAGE = 10
\ No newline at end of file
+ITEMS_PER_PAGE = 10
+
+# ================== DATABASE POOL ==================
+# Pooled MySQL connections per process. When all DB_POOL_SIZE are busy a
+# caller waits up to DB_POOL_TIMEOUT seconds, then gets one of at most
+# DB_POOL_MAX_OVERFLOW short-lived extra connections. Idle connections are
+# closed after DB_POOL_IDLE_TIMEOUT and pinged on checkout once idle for
+# DB_POOL_PING_AFTER seconds
+DB_POOL_SIZE = 10
+DB_POOL_MAX_OVERFLOW = 5
+DB_POOL_TIMEOUT = 2.0
+DB_POOL_IDLE_TIMEOUT = 300
+DB_POOL_PING_AFTER = 10
+
+# Threads running DB queries for async callers (async_database); one pooled
+# connection each, so queries beyond the pool size queue instead of overflowing
+DB_EXECUTOR_WORKERS = DB_POOL_SIZE
+
+# In-process cache of user rows (by id and phone) for repeated lookups within
+# one interaction; every write through database.py invalidates the row
+USER_CACHE_TTL = 30
+USER_CACHE_SIZE = 1000
+
+# ================== FORWARDER TUNING ==================
+# Resolved target peers kept per account (memory + sessions/<phone>.entities.json)
+ENTITY_CACHE_TTL = 7 * 24 * 3600
+ENTITY_CACHE_SIZE = 5000
+
+# Fan-out: default in-flight forwards per account in "concurrent" mode and
+# minimum spacing (seconds) between forward starts of one account
+FORWARD_CONCURRENCY = 5
+FORWARD_PACING = 0.1
+
+# FloodWait of at least this many seconds is treated as account-wide: every
+# target of the account is deferred instead of just the throttled one
+ACCOUNT_FLOOD_WAIT_THRESHOLD = 60
+
+# Seconds between safety-net refetches of the cached latest Saved Message
+# (normally kept current by update events)
+SAVED_RECONCILE_INTERVAL = 300
+
+# Supervisor re-reads rows updated this many seconds before its last
+# watermark, so writes committed out of order are still picked up
+SYNC_OVERLAP_SECONDS = 5
+
+# Supervisor streams users in keyset batches of this size; the full id scan
+# that detects deleted users runs at most every SUPERVISOR_FULL_SCAN_INTERVAL
+SUPERVISOR_BATCH_SIZE = 1000
+SUPERVISOR_FULL_SCAN_INTERVAL = 30
+
+# Forwarding coroutines shared by all accounts; due accounts queue for a slot
+SCHEDULER_POOL_SIZE = 50
+
+# Shard processes hosting the Telethon clients (0 = run them inside the bot
+# process); accounts are assigned by a stable hash of the phone number and
+# the shards report status back every SHARD_STATUS_INTERVAL seconds
+FORWARDER_SHARDS = 0
+SHARD_STATUS_INTERVAL = 10
+
+# Forwarding reports are merged into one digest per log channel every
+# LOG_DIGEST_INTERVAL seconds; at most LOG_QUEUE_SIZE entries are buffered.
+# Sends are spaced per chat and globally to stay under Bot API limits
+LOG_DIGEST_INTERVAL = 60
+LOG_QUEUE_SIZE = 5000
+LOG_CHANNEL_SEND_INTERVAL = 3.0
+LOG_GLOBAL_SEND_INTERVAL = 0.05
+
+# Targets failing TARGET_QUARANTINE_THRESHOLD times in a row are skipped for
+# TARGET_QUARANTINE_BASE seconds, doubling after every failed probe up to
+# TARGET_QUARANTINE_MAX
+TARGET_QUARANTINE_THRESHOLD = 3
+TARGET_QUARANTINE_BASE = 600
+TARGET_QUARANTINE_MAX = 24 * 3600
+
+# Local SQLite file for high-volume forwarder state (dedup ledger)
+LOCAL_STORE_PATH = "sessions/forwarder_state.sqlite3"
+
+# Newest Saved Messages each worker keeps cached (covers a full 10-item
+# album and the "last N messages" content mode). Also caps N for the
+# "last N marked messages" mode, where marking a message means pinning it
+# in Saved Messages
+SAVED_WINDOW_SIZE = 10
+
+# Telethon clients connected in parallel while workers warm up; first runs
+# after startup are spread over each account's delay window
+STARTUP_CONNECT_CONCURRENCY = 10
+
+# Seconds between schedule checkpoints (loop count, last run, next due and
+# deferred targets) written to the local store; always written on shutdown
+CHECKPOINT_INTERVAL = 60
+
+# Adaptive (AIMD) pacing per account: spacing between forwards stays within
+# [PACING_MIN_INTERVAL, PACING_MAX_INTERVAL], shrinks by PACING_SUCCESS_STEP
+# every PACING_SUCCESSES_PER_STEP successes and is multiplied by
+# PACING_BACKOFF_FACTOR on FloodWait. Account-wide waits may stretch the loop
+# delay up to ADAPTIVE_CADENCE_MAX times (1.0 keeps the configured delay)
+PACING_MIN_INTERVAL = 0.05
+PACING_MAX_INTERVAL = 5.0
+PACING_SUCCESS_STEP = 0.01
+PACING_SUCCESSES_PER_STEP = 10
+PACING_BACKOFF_FACTOR = 2.0
+ADAPTIVE_CADENCE_MAX = 1.0
+
+# Forwarding clients are send-only: no update stream, no catch-up and a small
+# in-memory Telethon entity cache. SAVED_MESSAGES_EVENTS opts back into the
+# update stream so Saved Messages are tracked through events instead of one
+# history fetch per loop
+SAVED_MESSAGES_EVENTS = False
+CLIENT_ENTITY_CACHE_LIMIT = 500
+
+# Seconds between per-client memory estimates reported in /status. Each
+# status snapshot re-estimates at most CLIENT_MEMORY_SAMPLES_PER_STATUS
+# clients, walking at most CLIENT_MEMORY_MAX_OBJECTS objects per client
+CLIENT_MEMORY_SAMPLE_INTERVAL = 300
+CLIENT_MEMORY_SAMPLES_PER_STATUS = 2
+CLIENT_MEMORY_MAX_OBJECTS = 20_000
+
+# Targets listed by several accounts of this process are coordinated: at
+# least TARGET_MIN_GAP seconds between forwards from any account, at most
+# TARGET_HOURLY_CAP forwards per rolling hour, slots shared across accounts
+TARGET_MIN_GAP = 300
+TARGET_HOURLY_CAP = 6
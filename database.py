@@ -1,11 +1,26 @@
 # ================== DATABASE.PY ==================
 import mysql.connector
 from mysql.connector import Error
+from mysql.connector.errors import InterfaceError, OperationalError, PoolError
+import functools
+import inspect
 import json
+import time
+from collections import Counter, OrderedDict, deque
 from datetime import datetime, timedelta
 import threading
 from contextlib import contextmanager
 
+from config import (
+    DB_POOL_SIZE,
+    DB_POOL_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_IDLE_TIMEOUT,
+    DB_POOL_PING_AFTER,
+    USER_CACHE_TTL,
+    USER_CACHE_SIZE,
+)
+
 # MySQL connection configuration
 DB_CONFIG = {
     'host': '157.173.220.167',
@@ -17,11 +32,8 @@ DB_CONFIG = {
     'autocommit': True
 }
 
-# Thread-safe database connection
-db_lock = threading.Lock()
-
 def get_db_connection():
-    """Get a MySQL database connection"""
+    """Open a new MySQL connection (pooled callers use get_db_cursor)"""
     try:
         conn = mysql.connector.connect(**DB_CONFIG)
         return conn
@@ -29,13 +41,159 @@ def get_db_connection():
         print(f"❌ MySQL connection error: {e}")
         return None
 
+class ConnectionPool:
+    """Fixed-size pool of MySQL connections with overflow.
+
+    Connections idle longer than ping_after are pinged before reuse and
+    replaced if dead; those idle longer than idle_timeout are closed. Once all
+    `size` connections are checked out, a caller waits up to `timeout`
+    seconds and then gets a temporary overflow connection (closed on release).
+    """
+
+    def __init__(self, size=DB_POOL_SIZE, max_overflow=DB_POOL_MAX_OVERFLOW, timeout=DB_POOL_TIMEOUT,
+                 idle_timeout=DB_POOL_IDLE_TIMEOUT, ping_after=DB_POOL_PING_AFTER):
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.ping_after = ping_after
+        self._idle = deque()  # (connection, returned_at), most recently returned last
+        self._in_use = 0  # Pooled connections checked out
+        self._overflow = 0  # Overflow connections checked out
+        self._cond = threading.Condition()
+        self._stats = Counter()
+
+    def _evict_idle(self, now):
+        # Oldest first: stop at the first connection that is still fresh
+        while self._idle and now - self._idle[0][1] >= self.idle_timeout:
+            conn, _ = self._idle.popleft()
+            self._close(conn)
+            self._stats['evicted'] += 1
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _healthy(self, conn, idle_for):
+        if idle_for < self.ping_after:
+            return True
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Exception:
+            self._stats['failed_pings'] += 1
+            self._close(conn)
+            return False
+
+    def acquire(self):
+        """Check out a connection; returns (connection, pooled) or (None, False) if MySQL is unreachable"""
+        started = time.monotonic()
+        deadline = started + self.timeout
+        conn, returned_at, pooled = None, started, True
+        with self._cond:
+            self._stats['checkouts'] += 1
+            while True:
+                now = time.monotonic()
+                self._evict_idle(now)
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+                    self._in_use += 1
+                    break
+                if self._in_use < self.size:
+                    self._in_use += 1
+                    break
+                if now >= deadline:
+                    if self._overflow >= self.max_overflow:
+                        self._stats['timeouts'] += 1
+                        raise PoolError(
+                            f"Connection pool exhausted ({self.size} + {self.max_overflow} overflow in use)"
+                        )
+                    self._overflow += 1
+                    self._stats['overflows'] += 1
+                    pooled = False
+                    break
+                self._stats['waits'] += 1
+                self._cond.wait(deadline - now)
+            self._stats['wait_time'] += time.monotonic() - started
+
+        # Network round trips happen outside the pool lock
+        if conn is not None and not self._healthy(conn, time.monotonic() - returned_at):
+            conn = None
+        if conn is None:
+            conn = get_db_connection()
+            if conn is None:
+                self._release_slot(pooled)
+                return None, False
+            self._stats['opened'] += 1
+        return conn, pooled
+
+    def _release_slot(self, pooled):
+        with self._cond:
+            if pooled:
+                self._in_use -= 1
+            else:
+                self._overflow -= 1
+            self._cond.notify()
+
+    def release(self, conn, pooled, discard=False):
+        """Return a connection; overflow and broken connections are closed instead"""
+        if not pooled or discard:
+            self._close(conn)
+            if discard:
+                self._stats['discarded'] += 1
+            self._release_slot(pooled)
+            return
+        with self._cond:
+            self._in_use -= 1
+            self._idle.append((conn, time.monotonic()))
+            self._evict_idle(time.monotonic())
+            self._cond.notify()
+
+    def close(self):
+        """Close every idle connection (checked-out ones close when released)"""
+        with self._cond:
+            while self._idle:
+                self._close(self._idle.popleft()[0])
+
+    def stats(self):
+        with self._cond:
+            stats = {
+                'size': self.size,
+                'max_overflow': self.max_overflow,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'overflow_in_use': self._overflow,
+            }
+            for key in ('checkouts', 'opened', 'waits', 'overflows', 'timeouts', 'evicted',
+                        'failed_pings', 'discarded'):
+                stats[key] = self._stats[key]
+            stats['avg_wait_ms'] = round(
+                1000 * self._stats['wait_time'] / max(1, self._stats['checkouts']), 2
+            )
+            return stats
+
+_pool = ConnectionPool()
+
+def get_pool_stats():
+    """Checkout, wait, overflow and eviction counters of this process' connection pool"""
+    return _pool.stats()
+
+def close_pool():
+    """Close idle pooled connections (e.g. on shutdown)"""
+    _pool.close()
+
 @contextmanager
 def get_db_cursor(commit=True):
-    """Context manager for database operations"""
+    """Context manager for database operations on a pooled connection"""
     conn = None
+    pooled = False
     cursor = None
+    discard = False
     try:
-        conn = get_db_connection()
+        conn, pooled = _pool.acquire()
         if conn is None:
             yield None
             return
@@ -46,102 +204,339 @@ def get_db_cursor(commit=True):
         if commit:
             conn.commit()
     except Error as e:
-        if conn:
-            conn.rollback()
+        # A dropped connection must not go back to the pool
+        discard = isinstance(e, (InterfaceError, OperationalError))
+        if conn and not discard:
+            try:
+                conn.rollback()
+            except Error:
+                discard = True
         print(f"❌ Database error: {e}")
         raise  # Re-raise the exception instead of yielding None
+    except BaseException:
+        if conn:
+            try:
+                conn.rollback()
+            except Exception:
+                discard = True
+        raise
     finally:
         if cursor:
-            cursor.close()
+            try:
+                cursor.close()
+            except Exception:
+                discard = True
         if conn:
-            conn.close()
+            _pool.release(conn, pooled, discard)
+
+class UserCache:
+    """Read-through LRU/TTL cache of user rows, keyed by id with a phone index.
+
+    Writers invalidate after their commit. A read that started before an
+    invalidation does not store its row (the generation moved on), so a slow
+    reader cannot put a stale row back.
+    """
+
+    def __init__(self, ttl=USER_CACHE_TTL, max_size=USER_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.generation = 0
+        self._entries = OrderedDict()  # id -> (row, stored_at)
+        self._ids = {}  # phone -> id
+        self._lock = threading.Lock()
+        self._stats = Counter()
+
+    def _lookup(self, uid):
+        entry = self._entries.get(uid)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[1] >= self.ttl:
+            self._drop(uid)
+            return None
+        self._entries.move_to_end(uid)
+        return dict(entry[0])
+
+    def _drop(self, uid):
+        entry = self._entries.pop(uid, None)
+        if entry is not None:
+            self._ids.pop(entry[0].get('phone'), None)
+
+    def get(self, uid=None, phone=None):
+        """Cached copy of a row, or None on miss/expiry"""
+        with self._lock:
+            if uid is None:
+                uid = self._ids.get(phone)
+            row = self._lookup(uid) if uid is not None else None
+            self._stats['hits' if row is not None else 'misses'] += 1
+            return row
+
+    def put(self, row, generation):
+        """Store a row read while the cache was at `generation`"""
+        if not row:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._drop(row['id'])
+            self._entries[row['id']] = (dict(row), time.monotonic())
+            self._ids[row['phone']] = row['id']
+            while len(self._entries) > self.max_size:
+                self._drop(next(iter(self._entries)))
+
+    def refresh(self, rows):
+        """Replace cached rows that a bulk read returned in a newer version"""
+        with self._lock:
+            for row in rows:
+                entry = self._entries.get(row['id'])
+                # Strictly newer only: a slow bulk read must not undo a fresher put
+                if entry is not None and (row.get('version') or 0) > (entry[0].get('version') or 0):
+                    self._entries[row['id']] = (dict(row), time.monotonic())
+                    self._stats['refreshed'] += 1
+
+    def invalidate(self, uid=None, phone=None):
+        with self._lock:
+            self.generation += 1
+            self._stats['invalidations'] += 1
+            if uid is None:
+                uid = self._ids.get(phone)
+            if uid is not None:
+                self._drop(uid)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._stats['invalidations'] += 1
+            self._entries.clear()
+            self._ids.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            return {
+                'size': len(self._entries),
+                'hits': self._stats['hits'],
+                'misses': self._stats['misses'],
+                'hit_rate': round(self._stats['hits'] / lookups, 3) if lookups else 0.0,
+                'invalidations': self._stats['invalidations'],
+                'refreshed': self._stats['refreshed'],
+            }
+
+_user_cache = UserCache()
+
+def get_user_cache_stats():
+    """Hit/miss/invalidation counters of this process' user row cache"""
+    return _user_cache.stats()
+
+def invalidates_user(func):
+    """Decorator for user row writers: invalidate the cached row (by `phone` or `uid`) once the write returns"""
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            bound = signature.bind_partial(*args, **kwargs).arguments
+            _user_cache.invalidate(uid=bound.get('uid'), phone=bound.get('phone'))
+    return wrapper
+
+def ensure_column(cursor, table, column, definition):
+    """Add a column to an existing table if it is missing"""
+    cursor.execute("""
+        SELECT COUNT(*) as count
+        FROM information_schema.columns
+        WHERE table_schema = %s AND table_name = %s AND column_name = %s
+    """, (DB_CONFIG['database'], table, column))
+    result = cursor.fetchone()
+    if not result or result['count'] == 0:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        print(f"✅ Added column {table}.{column}")
+
+def ensure_index(cursor, table, index, columns):
+    """Add an index to an existing table if it is missing"""
+    cursor.execute("""
+        SELECT COUNT(*) as count
+        FROM information_schema.statistics
+        WHERE table_schema = %s AND table_name = %s AND index_name = %s
+    """, (DB_CONFIG['database'], table, index))
+    result = cursor.fetchone()
+    if not result or result['count'] == 0:
+        cursor.execute(f"ALTER TABLE {table} ADD INDEX {index} ({columns})")
+        print(f"✅ Added index {table}.{index}")
 
 def init_db():
     """Initialize the database with required tables"""
     try:
-        with db_lock:
-            with get_db_cursor() as cursor:
-                if cursor is None:
-                    print("❌ Failed to get database cursor")
-                    return
-                
-                # Create users table
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS users (
-                        id INT AUTO_INCREMENT PRIMARY KEY,
-                        api_id VARCHAR(255) NOT NULL,
-                        api_hash VARCHAR(255) NOT NULL,
-                        phone VARCHAR(20) UNIQUE NOT NULL,
-                        delay INT DEFAULT 5,
-                        auto_forwarding BOOLEAN DEFAULT FALSE,
-                        urls TEXT,
-                        log_channel_id VARCHAR(255),
-                        expiry_date DATETIME,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        INDEX idx_phone (phone),
-                        INDEX idx_expiry_date (expiry_date),
-                        INDEX idx_auto_forwarding (auto_forwarding)
-                    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
-                """)
-                
-                print("✅ Database initialized successfully")
+        with get_db_cursor() as cursor:
+            if cursor is None:
+                print("❌ Failed to get database cursor")
+                return
+            
+            # Create users table
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS users (
+                    id INT AUTO_INCREMENT PRIMARY KEY,
+                    api_id VARCHAR(255) NOT NULL,
+                    api_hash VARCHAR(255) NOT NULL,
+                    phone VARCHAR(20) UNIQUE NOT NULL,
+                    delay INT DEFAULT 5,
+                    auto_forwarding BOOLEAN DEFAULT FALSE,
+                    urls TEXT,
+                    log_channel_id VARCHAR(255),
+                    expiry_date DATETIME,
+                    forward_mode VARCHAR(16) DEFAULT 'sequential',
+                    max_concurrency INT DEFAULT NULL,
+                    repost_interval INT NOT NULL DEFAULT 0,
+                    content_mode VARCHAR(16) DEFAULT 'single',
+                    content_count INT NOT NULL DEFAULT 1,
+                    version INT NOT NULL DEFAULT 0,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
+                    INDEX idx_phone (phone),
+                    INDEX idx_expiry_date (expiry_date),
+                    INDEX idx_auto_forwarding (auto_forwarding),
+                    INDEX idx_updated_at (updated_at)
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+            """)
+
+            # Columns added after the first release
+            ensure_column(cursor, "users", "forward_mode", "VARCHAR(16) DEFAULT 'sequential'")
+            ensure_column(cursor, "users", "max_concurrency", "INT DEFAULT NULL")
+            ensure_column(cursor, "users", "repost_interval", "INT NOT NULL DEFAULT 0")
+            ensure_column(cursor, "users", "content_mode", "VARCHAR(16) DEFAULT 'single'")
+            ensure_column(cursor, "users", "content_count", "INT NOT NULL DEFAULT 1")
+            ensure_column(cursor, "users", "version", "INT NOT NULL DEFAULT 0")
+            ensure_column(
+                cursor, "users", "updated_at",
+                "TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)"
+            )
+            ensure_index(cursor, "users", "idx_updated_at", "updated_at")
+
+            # Per-(account, target) failure streaks and quarantine windows
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS target_health (
+                    id INT AUTO_INCREMENT PRIMARY KEY,
+                    phone VARCHAR(20) NOT NULL,
+                    target VARCHAR(512) NOT NULL,
+                    failures INT NOT NULL DEFAULT 0,
+                    last_error VARCHAR(64),
+                    probe_after DATETIME NULL,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                    UNIQUE KEY uq_phone_target (phone, target),
+                    FOREIGN KEY (phone) REFERENCES users(phone) ON DELETE CASCADE ON UPDATE CASCADE
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+            """)
+
+            # Resolved target peers per account (access_hash is only valid for that account)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS resolved_peers (
+                    id INT AUTO_INCREMENT PRIMARY KEY,
+                    phone VARCHAR(20) NOT NULL,
+                    cache_key VARCHAR(255) NOT NULL,
+                    peer_type VARCHAR(16) NOT NULL,
+                    peer_id BIGINT NOT NULL,
+                    access_hash BIGINT NOT NULL DEFAULT 0,
+                    resolved_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                    UNIQUE KEY uq_phone_key (phone, cache_key),
+                    FOREIGN KEY (phone) REFERENCES users(phone) ON DELETE CASCADE ON UPDATE CASCADE
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+            """)
+            # When the peer was resolved, so its TTL survives restarts
+            ensure_column(cursor, "resolved_peers", "resolved_at", "TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP")
+
+            # Forwarding targets, one row per URL (replaces the users.urls JSON list)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS targets (
+                    id INT AUTO_INCREMENT PRIMARY KEY,
+                    user_id INT NOT NULL,
+                    position BIGINT NOT NULL,
+                    raw_url VARCHAR(512) NOT NULL,
+                    url_type VARCHAR(32) NOT NULL,
+                    identifier VARCHAR(255) NOT NULL,
+                    chat_id BIGINT NULL,
+                    topic_id INT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                    UNIQUE KEY uq_user_url (user_id, raw_url),
+                    INDEX idx_user_position (user_id, position),
+                    INDEX idx_chat_id (chat_id),
+                    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+            """)
+            migrate_urls_to_targets(cursor)
+            
+            print("✅ Database initialized successfully")
     except Exception as e:
         print(f"❌ Database initialization error: {e}")
 
+@invalidates_user
 def add_user(api_id, api_hash, phone):
     """Add a new user to the database"""
     try:
-        with db_lock:
-            with get_db_cursor() as cursor:
-                if cursor is None:
-                    return False
-                
-                expiry_date = datetime.now() + timedelta(days=30)
-                
-                cursor.execute("""
-                    INSERT INTO users (api_id, api_hash, phone, urls, expiry_date)
-                    VALUES (%(api_id)s, %(api_hash)s, %(phone)s, %(urls)s, %(expiry_date)s)
-                    ON DUPLICATE KEY UPDATE
-                    api_id = VALUES(api_id),
-                    api_hash = VALUES(api_hash),
-                    expiry_date = VALUES(expiry_date)
-                """, {
-                    'api_id': api_id,
-                    'api_hash': api_hash,
-                    'phone': phone,
-                    'urls': '[]',
-                    'expiry_date': expiry_date
-                })
-                
-                return True
+        with get_db_cursor() as cursor:
+            if cursor is None:
+                return False
+            
+            expiry_date = datetime.now() + timedelta(days=30)
+            
+            cursor.execute("""
+                INSERT INTO users (api_id, api_hash, phone, urls, expiry_date)
+                VALUES (%(api_id)s, %(api_hash)s, %(phone)s, %(urls)s, %(expiry_date)s)
+                ON DUPLICATE KEY UPDATE
+                api_id = VALUES(api_id),
+                api_hash = VALUES(api_hash),
+                expiry_date = VALUES(expiry_date),
+                version = version + 1
+            """, {
+                'api_id': api_id,
+                'api_hash': api_hash,
+                'phone': phone,
+                'urls': '[]',
+                'expiry_date': expiry_date
+            })
+            
+            return True
     except Exception as e:
         print(f"❌ Database error in add_user: {e}")
         return False
 
 def get_user_by_phone(phone):
-    """Get user data by phone number"""
+    """Get user data by phone number (served from the user cache when fresh)"""
+    row = _user_cache.get(phone=phone)
+    if row is not None:
+        return row
     try:
-        with db_lock:
-            with get_db_cursor(commit=False) as cursor:
-                if cursor is None:
-                    return None
-                
-                cursor.execute("SELECT * FROM users WHERE phone = %s", (phone,))
-                return cursor.fetchone()
+        generation = _user_cache.generation
+        with get_db_cursor(commit=False) as cursor:
+            if cursor is None:
+                return None
+            
+            cursor.execute("SELECT * FROM users WHERE phone = %s", (phone,))
+            row = cursor.fetchone()
+            attach_urls(cursor, [row] if row else [])
+            _user_cache.put(row, generation)
+            return row
     except Exception as e:
         print(f"❌ Database error in get_user_by_phone: {e}")
         return None
 
 def get_user_by_id(uid):
-    """Get user data by user ID"""
+    """Get user data by user ID (served from the user cache when fresh)"""
+    row = _user_cache.get(uid=uid)
+    if row is not None:
+        return row
     try:
-        with db_lock:
-            with get_db_cursor(commit=False) as cursor:
-                if cursor is None:
-                    return None
-                
-                cursor.execute("SELECT * FROM users WHERE id = %s", (uid,))
-                return cursor.fetchone()
+        generation = _user_cache.generation
+        with get_db_cursor(commit=False) as cursor:
+            if cursor is None:
+                return None
+            
+            cursor.execute("SELECT * FROM users WHERE id = %s", (uid,))
+            row = cursor.fetchone()
+            attach_urls(cursor, [row] if row else [])
+            _user_cache.put(row, generation)
+            return row
     except Exception as e:
         print(f"❌ Database error in get_user_by_id: {e}")
         return None
@@ -149,34 +544,107 @@ def get_user_by_id(uid):
 def get_all_users(offset=0, limit=10):
     """Get all users with pagination for management interface"""
     try:
-        with db_lock:
-            with get_db_cursor(commit=False) as cursor:
-                if cursor is None:
-                    return []
-                
-                cursor.execute("""
-                    SELECT id, phone, api_id 
-                    FROM users 
-                    ORDER BY id DESC 
-                    LIMIT %s OFFSET %s
-                """, (limit, offset))
-                
-                rows = cursor.fetchall()
-                return [(row['id'], row['phone'], row['api_id']) for row in rows]
+        with get_db_cursor(commit=False) as cursor:
+            if cursor is None:
+                return []
+            
+            cursor.execute("""
+                SELECT id, phone, api_id 
+                FROM users 
+                ORDER BY id DESC 
+                LIMIT %s OFFSET %s
+            """, (limit, offset))
+            
+            rows = cursor.fetchall()
+            return [(row['id'], row['phone'], row['api_id']) for row in rows]
     except Exception as e:
         print(f"❌ Database error in get_all_users: {e}")
         return []
 
+def get_users_changed_since(since=None, after=None, limit=1000):
+    """Get one batch of full rows changed at or after `since` (all rows when None).
+
+    Rows come back ordered by (updated_at, id); pass the last row's pair as
+    `after` to read the next batch. Every write bumps `version` and
+    `updated_at`, so callers can poll with a watermark and compare versions
+    instead of re-reading every row.
+    """
+    try:
+        with get_db_cursor(commit=False) as cursor:
+            if cursor is None:
+                return []
+            
+            conditions = []
+            params = []
+            if since is not None:
+                conditions.append("updated_at >= %s")
+                params.append(since)
+            if after is not None:
+                conditions.append("(updated_at > %s OR (updated_at = %s AND id > %s))")
+                params.extend([after[0], after[0], after[1]])
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+            params.append(limit)
+            
+            cursor.execute(
+                f"SELECT * FROM users {where} ORDER BY updated_at, id LIMIT %s", tuple(params)
+            )
+            rows = attach_urls(cursor, cursor.fetchall())
+            # Picks up writes made by other processes as the supervisor polls
+            _user_cache.refresh(rows)
+            return rows
+    except Exception as e:
+        print(f"❌ Database error in get_users_changed_since: {e}")
+        return []
+
+def iter_users_changed_since(since=None, batch_size=1000):
+    """Stream changed rows in keyset-paginated batches (no lock held between batches)"""
+    after = None
+    while True:
+        rows = get_users_changed_since(since, after, batch_size)
+        if not rows:
+            return
+        yield rows
+        if len(rows) < batch_size:
+            return
+        after = (rows[-1]['updated_at'], rows[-1]['id'])
+
+def get_user_phone_batch(after_id=0, limit=1000):
+    """Get (id, phone) pairs with id > after_id, ordered by id"""
+    try:
+        with get_db_cursor(commit=False) as cursor:
+            if cursor is None:
+                return []
+            
+            cursor.execute(
+                "SELECT id, phone FROM users WHERE id > %s ORDER BY id LIMIT %s",
+                (after_id, limit)
+            )
+            return [(row['id'], row['phone']) for row in cursor.fetchall()]
+    except Exception as e:
+        print(f"❌ Database error in get_user_phone_batch: {e}")
+        raise  # A silently empty scan would look like every user was removed
+
+def iter_user_phones(batch_size=1000):
+    """Stream (id, phone) for every user using keyset pagination on id"""
+    after_id = 0
+    while True:
+        batch = get_user_phone_batch(after_id, batch_size)
+        if not batch:
+            return
+        yield batch
+        if len(batch) < batch_size:
+            return
+        after_id = batch[-1][0]
+
 def get_all_users_full():
     """Get all users with full data for forwarder system"""
     try:
-        with db_lock:
-            with get_db_cursor(commit=False) as cursor:
-                if cursor is None:
-                    return []
-                
-                cursor.execute("SELECT * FROM users ORDER BY id")
-                return cursor.fetchall()
+        with get_db_cursor(commit=False) as cursor:
+            if cursor is None:
+                return []
+            
+            cursor.execute("SELECT * FROM users ORDER BY id")
+            return attach_urls(cursor, cursor.fetchall())
     except Exception as e:
         print(f"❌ Database error in get_all_users_full: {e}")
         return []
@@ -184,114 +652,401 @@ def get_all_users_full():
 def get_user_count():
     """Get total number of users"""
     try:
-        with db_lock:
-            with get_db_cursor(commit=False) as cursor:
-                if cursor is None:
-                    return 0
-                
-                cursor.execute("SELECT COUNT(*) as count FROM users")
-                result = cursor.fetchone()
-                return result['count'] if result else 0
+        with get_db_cursor(commit=False) as cursor:
+            if cursor is None:
+                return 0
+            
+            cursor.execute("SELECT COUNT(*) as count FROM users")
+            result = cursor.fetchone()
+            return result['count'] if result else 0
     except Exception as e:
         print(f"❌ Database error in get_user_count: {e}")
         return 0
 
+@invalidates_user
 def delete_user(uid):
     """Delete a user by ID"""
     try:
-        with db_lock:
-            with get_db_cursor() as cursor:
-                if cursor is None:
-                    return False
-                
-                cursor.execute("DELETE FROM users WHERE id = %s", (uid,))
-                return cursor.rowcount > 0
+        with get_db_cursor() as cursor:
+            if cursor is None:
+                return False
+            
+            cursor.execute("DELETE FROM users WHERE id = %s", (uid,))
+            return cursor.rowcount > 0
     except Exception as e:
         print(f"❌ Database error in delete_user: {e}")
         return False
 
+# =============================
+# Targets
+# =============================
+def _parse_target(url):
+    # Imported here: targets -> entity_cache -> database would be circular at import time
+    from targets import parse_telegram_url
+    identifier, topic_id, url_type, chat_id = parse_telegram_url(url)
+    return identifier, url_type, chat_id, topic_id
+
+def _lock_user(cursor, phone):
+    """Start a transaction holding the user's row lock; returns the user id or None"""
+    cursor.execute("START TRANSACTION")
+    cursor.execute("SELECT id FROM users WHERE phone = %s FOR UPDATE", (phone,))
+    row = cursor.fetchone()
+    return row['id'] if row else None
+
+def _bump_user_version(cursor, user_id):
+    # Lets the supervisor (and other processes' user caches) see the target change
+    cursor.execute("UPDATE users SET version = version + 1 WHERE id = %s", (user_id,))
+
+def _insert_targets(cursor, user_id, urls, after_position):
+    """Insert new URLs after `after_position`, skipping ones the user already has; returns the count"""
+    seen = set()
+    rows = []
+    for url in urls:
+        url = url.strip()
+        if not url or url in seen:
+            continue
+        seen.add(url)
+        after_position += 1
+        rows.append((user_id, after_position, url, *_parse_target(url)))
+    if not rows:
+        return 0
+    cursor.executemany("""
+        INSERT IGNORE INTO targets (user_id, position, raw_url, identifier, url_type, chat_id, topic_id)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+    """, rows)
+    return cursor.rowcount
+
+def attach_urls(cursor, rows):
+    """Set row['urls'] (JSON list, as the old users.urls column) from the targets table"""
+    if not rows:
+        return rows
+    by_id = {row['id']: [] for row in rows}
+    placeholders = ", ".join(["%s"] * len(by_id))
+    cursor.execute(f"""
+        SELECT user_id, raw_url FROM targets
+        WHERE user_id IN ({placeholders})
+        ORDER BY user_id, position
+    """, tuple(by_id))
+    for target in cursor.fetchall():
+        by_id[target['user_id']].append(target['raw_url'])
+    for row in rows:
+        row['urls'] = json.dumps(by_id[row['id']])
+    return rows
+
+def migrate_urls_to_targets(cursor):
+    """Move every users.urls JSON list into the targets table (once per user)"""
+    cursor.execute("SELECT id, phone, urls FROM users WHERE urls IS NOT NULL AND urls NOT IN ('', '[]')")
+    migrated = 0
+    for row in cursor.fetchall():
+        try:
+            urls = json.loads(row['urls'])
+        except (json.JSONDecodeError, TypeError):
+            print(f"⚠️ Invalid URL JSON for user {row['phone']}, not migrated")
+            continue
+        cursor.execute("SELECT COALESCE(MAX(position), 0) AS last FROM targets WHERE user_id = %s", (row['id'],))
+        _insert_targets(cursor, row['id'], [url for url in urls if isinstance(url, str)], cursor.fetchone()['last'])
+        # Emptied rather than dropped so older readers still see a valid list;
+        # the version bump lets running forwarders and user caches see the change
+        cursor.execute("UPDATE users SET version = version + 1, urls = NULL WHERE id = %s", (row['id'],))
+        migrated += 1
+    if migrated:
+        print(f"✅ Migrated URL lists of {migrated} users to the targets table")
+
+def get_user_targets(phone):
+    """Get a user's targets in order (None if the user does not exist)"""
+    try:
+        with get_db_cursor(commit=False) as cursor:
+            if cursor is None:
+                return None
+            
+            cursor.execute("SELECT id FROM users WHERE phone = %s", (phone,))
+            user = cursor.fetchone()
+            if not user:
+                return None
+            cursor.execute("""
+                SELECT id, position, raw_url, url_type, identifier, chat_id, topic_id
+                FROM targets
+                WHERE user_id = %s
+                ORDER BY position
+            """, (user['id'],))
+            return cursor.fetchall()
+    except Exception as e:
+        print(f"❌ Database error in get_user_targets: {e}")
+        return None
+
+@invalidates_user
+def add_user_targets(phone, urls):
+    """Append URLs to a user's list (existing ones are skipped); returns (added, total) or None"""
+    try:
+        with get_db_cursor() as cursor:
+            if cursor is None:
+                return None
+            
+            user_id = _lock_user(cursor, phone)
+            if user_id is None:
+                return None
+            cursor.execute(
+                "SELECT COALESCE(MAX(position), 0) AS last, COUNT(*) AS total FROM targets WHERE user_id = %s",
+                (user_id,)
+            )
+            current = cursor.fetchone()
+            added = _insert_targets(cursor, user_id, urls, current['last'])
+            if added:
+                _bump_user_version(cursor, user_id)
+            return added, current['total'] + added
+    except Exception as e:
+        print(f"❌ Database error in add_user_targets: {e}")
+        return None
+
+@invalidates_user
+def delete_user_target(phone, target_id):
+    """Delete one target by id; returns its URL, or None if it does not exist"""
+    try:
+        with get_db_cursor() as cursor:
+            if cursor is None:
+                return None
+            
+            user_id = _lock_user(cursor, phone)
+            if user_id is None:
+                return None
+            cursor.execute(
+                "SELECT raw_url FROM targets WHERE id = %s AND user_id = %s", (target_id, user_id)
+            )
+            target = cursor.fetchone()
+            if not target:
+                return None
+            cursor.execute("DELETE FROM targets WHERE id = %s", (target_id,))
+            _bump_user_version(cursor, user_id)
+            return target['raw_url']
+    except Exception as e:
+        print(f"❌ Database error in delete_user_target: {e}")
+        return None
+
+def get_target_health(phone):
+    """Get every failing/quarantined target of a user"""
+    try:
+        with get_db_cursor(commit=False) as cursor:
+            if cursor is None:
+                return []
+            
+            cursor.execute(
+                "SELECT target, failures, last_error, probe_after FROM target_health "
+                "WHERE phone = %s ORDER BY failures DESC",
+                (phone,)
+            )
+            return cursor.fetchall()
+    except Exception as e:
+        print(f"❌ Database error in get_target_health: {e}")
+        return []
+
+def save_target_health(phone, records):
+    """Upsert (target, failures, last_error, probe_after) records; failures == 0 clears the target"""
+    try:
+        with get_db_cursor() as cursor:
+            if cursor is None:
+                return False
+            
+            healthy = [(phone, target) for target, failures, _, _ in records if failures == 0]
+            failing = [(phone, *record) for record in records if record[1] > 0]
+            if healthy:
+                cursor.executemany(
+                    "DELETE FROM target_health WHERE phone = %s AND target = %s", healthy
+                )
+            if failing:
+                cursor.executemany("""
+                    INSERT INTO target_health (phone, target, failures, last_error, probe_after)
+                    VALUES (%s, %s, %s, %s, %s)
+                    ON DUPLICATE KEY UPDATE
+                        failures = VALUES(failures),
+                        last_error = VALUES(last_error),
+                        probe_after = VALUES(probe_after)
+                """, failing)
+            return True
+    except Exception as e:
+        print(f"❌ Database error in save_target_health: {e}")
+        return False
+
+def get_resolved_peers(phone):
+    """Get every stored peer (cache_key, peer_type, peer_id, access_hash, resolved_at epoch) of a user"""
+    try:
+        with get_db_cursor(commit=False) as cursor:
+            if cursor is None:
+                return []
+            
+            cursor.execute("""
+                SELECT cache_key, peer_type, peer_id, access_hash, UNIX_TIMESTAMP(resolved_at) AS resolved_at
+                FROM resolved_peers WHERE phone = %s
+            """, (phone,))
+            return cursor.fetchall()
+    except Exception as e:
+        print(f"❌ Database error in get_resolved_peers: {e}")
+        return []
+
+def save_resolved_peers(phone, upserts, deletes):
+    """Store freshly resolved peers (key, type, id, access_hash, resolved_at epoch) and drop rejected ones"""
+    try:
+        with get_db_cursor() as cursor:
+            if cursor is None:
+                return False
+            
+            if deletes:
+                cursor.executemany(
+                    "DELETE FROM resolved_peers WHERE phone = %s AND cache_key = %s",
+                    [(phone, key) for key in deletes]
+                )
+            if upserts:
+                cursor.executemany("""
+                    INSERT INTO resolved_peers (phone, cache_key, peer_type, peer_id, access_hash, resolved_at)
+                    VALUES (%s, %s, %s, %s, %s, FROM_UNIXTIME(%s))
+                    ON DUPLICATE KEY UPDATE
+                        peer_type = VALUES(peer_type),
+                        peer_id = VALUES(peer_id),
+                        access_hash = VALUES(access_hash),
+                        resolved_at = VALUES(resolved_at)
+                """, [(phone, *record) for record in upserts])
+            return True
+    except Exception as e:
+        print(f"❌ Database error in save_resolved_peers: {e}")
+        return False
+
+@invalidates_user
 def update_user_urls(phone, urls):
-    """Update URLs for a user"""
+    """Replace a user's whole URL list (stored as rows of the targets table)"""
     try:
-        with db_lock:
-            with get_db_cursor() as cursor:
-                if cursor is None:
-                    return False
-                
-                urls_json = json.dumps(urls) if isinstance(urls, list) else urls
-                cursor.execute("UPDATE users SET urls = %s WHERE phone = %s", (urls_json, phone))
-                return cursor.rowcount > 0
+        urls = json.loads(urls) if isinstance(urls, str) else list(urls or [])
+        with get_db_cursor() as cursor:
+            if cursor is None:
+                return False
+            
+            user_id = _lock_user(cursor, phone)
+            if user_id is None:
+                return False
+            cursor.execute("DELETE FROM targets WHERE user_id = %s", (user_id,))
+            _insert_targets(cursor, user_id, urls, 0)
+            _bump_user_version(cursor, user_id)
+            return True
     except Exception as e:
         print(f"❌ Database error in update_user_urls: {e}")
         return False
 
+@invalidates_user
 def set_forwarding(phone, status: bool):
     """Enable or disable auto-forwarding for a user"""
     try:
-        with db_lock:
-            with get_db_cursor() as cursor:
-                if cursor is None:
-                    return False
-                
-                cursor.execute("UPDATE users SET auto_forwarding = %s WHERE phone = %s", (status, phone))
-                return cursor.rowcount > 0
+        with get_db_cursor() as cursor:
+            if cursor is None:
+                return False
+            
+            cursor.execute("UPDATE users SET version = version + 1, auto_forwarding = %s WHERE phone = %s", (status, phone))
+            return cursor.rowcount > 0
     except Exception as e:
         print(f"❌ Database error in set_forwarding: {e}")
         return False
 
+@invalidates_user
 def update_user_delay(phone, delay: int):
     """Update forwarding delay for a user"""
     try:
-        with db_lock:
-            with get_db_cursor() as cursor:
-                if cursor is None:
-                    return False
-                
-                cursor.execute("UPDATE users SET delay = %s WHERE phone = %s", (delay, phone))
-                return cursor.rowcount > 0
+        with get_db_cursor() as cursor:
+            if cursor is None:
+                return False
+            
+            cursor.execute("UPDATE users SET version = version + 1, delay = %s WHERE phone = %s", (delay, phone))
+            return cursor.rowcount > 0
     except Exception as e:
         print(f"❌ Database error in update_user_delay: {e}")
         return False
 
+@invalidates_user
+def update_user_forward_mode(phone, mode: str, max_concurrency=None):
+    """Set sequential/concurrent forwarding mode and optional concurrency limit"""
+    try:
+        with get_db_cursor() as cursor:
+            if cursor is None:
+                return False
+            
+            cursor.execute(
+                "UPDATE users SET version = version + 1, forward_mode = %s, max_concurrency = %s WHERE phone = %s",
+                (mode, max_concurrency, phone)
+            )
+            return cursor.rowcount > 0
+    except Exception as e:
+        print(f"❌ Database error in update_user_forward_mode: {e}")
+        return False
+
+@invalidates_user
+def update_user_repost_interval(phone, seconds: int):
+    """Set the minimum re-post interval for an unchanged message (0 = always forward)"""
+    try:
+        with get_db_cursor() as cursor:
+            if cursor is None:
+                return False
+            
+            cursor.execute(
+                "UPDATE users SET version = version + 1, repost_interval = %s WHERE phone = %s",
+                (seconds, phone)
+            )
+            return cursor.rowcount > 0
+    except Exception as e:
+        print(f"❌ Database error in update_user_repost_interval: {e}")
+        return False
+
+@invalidates_user
+def update_user_content_mode(phone, mode: str, count: int = 1):
+    """Set what is forwarded: single (latest message), album, recent (last count) or marked (last count pinned)"""
+    try:
+        with get_db_cursor() as cursor:
+            if cursor is None:
+                return False
+            
+            cursor.execute(
+                "UPDATE users SET version = version + 1, content_mode = %s, content_count = %s WHERE phone = %s",
+                (mode, count, phone)
+            )
+            return cursor.rowcount > 0
+    except Exception as e:
+        print(f"❌ Database error in update_user_content_mode: {e}")
+        return False
+
+@invalidates_user
 def update_user_expiry_days(phone, days: int):
     """Update user expiry by adding days from current date"""
     try:
-        with db_lock:
-            with get_db_cursor() as cursor:
-                if cursor is None:
-                    return False
-                
-                new_expiry = datetime.now() + timedelta(days=days)
-                cursor.execute("UPDATE users SET expiry_date = %s WHERE phone = %s", (new_expiry, phone))
-                return cursor.rowcount > 0
+        with get_db_cursor() as cursor:
+            if cursor is None:
+                return False
+            
+            new_expiry = datetime.now() + timedelta(days=days)
+            cursor.execute("UPDATE users SET version = version + 1, expiry_date = %s WHERE phone = %s", (new_expiry, phone))
+            return cursor.rowcount > 0
     except Exception as e:
         print(f"❌ Database error in update_user_expiry_days: {e}")
         return False
 
+@invalidates_user
 def update_user_expiry_date(phone, expiry_date: str):
     """Update user expiry with specific date"""
     try:
-        with db_lock:
-            with get_db_cursor() as cursor:
-                if cursor is None:
-                    return False
-                
-                cursor.execute("UPDATE users SET expiry_date = %s WHERE phone = %s", (expiry_date, phone))
-                return cursor.rowcount > 0
+        with get_db_cursor() as cursor:
+            if cursor is None:
+                return False
+            
+            cursor.execute("UPDATE users SET version = version + 1, expiry_date = %s WHERE phone = %s", (expiry_date, phone))
+            return cursor.rowcount > 0
     except Exception as e:
         print(f"❌ Database error in update_user_expiry_date: {e}")
         return False
 
+@invalidates_user
 def update_user_log_channel(phone: str, log_channel_id):
     """Update log channel ID for a user. Pass None to remove."""
     try:
-        with db_lock:
-            with get_db_cursor() as cursor:
-                if cursor is None:
-                    return False
-                
-                cursor.execute("UPDATE users SET log_channel_id = %s WHERE phone = %s", (log_channel_id, phone))
-                return cursor.rowcount > 0
+        with get_db_cursor() as cursor:
+            if cursor is None:
+                return False
+            
+            cursor.execute("UPDATE users SET version = version + 1, log_channel_id = %s WHERE phone = %s", (log_channel_id, phone))
+            return cursor.rowcount > 0
     except Exception as e:
         print(f"❌ Database error in update_user_log_channel: {e}")
         return False
@@ -299,14 +1054,13 @@ def update_user_log_channel(phone: str, log_channel_id):
 def get_expired_users():
     """Get list of users whose accounts have expired"""
     try:
-        with db_lock:
-            with get_db_cursor(commit=False) as cursor:
-                if cursor is None:
-                    return []
-                
-                current_time = datetime.now()
-                cursor.execute("SELECT * FROM users WHERE expiry_date < %s", (current_time,))
-                return cursor.fetchall()
+        with get_db_cursor(commit=False) as cursor:
+            if cursor is None:
+                return []
+            
+            current_time = datetime.now()
+            cursor.execute("SELECT * FROM users WHERE expiry_date < %s", (current_time,))
+            return attach_urls(cursor, cursor.fetchall())
     except Exception as e:
         print(f"❌ Database error in get_expired_users: {e}")
         return []
@@ -314,30 +1068,29 @@ def get_expired_users():
 def get_active_users():
     """Get list of users whose accounts are still active"""
     try:
-        with db_lock:
-            with get_db_cursor(commit=False) as cursor:
-                if cursor is None:
-                    return []
-                
-                current_time = datetime.now()
-                cursor.execute("SELECT * FROM users WHERE expiry_date > %s", (current_time,))
-                return cursor.fetchall()
+        with get_db_cursor(commit=False) as cursor:
+            if cursor is None:
+                return []
+            
+            current_time = datetime.now()
+            cursor.execute("SELECT * FROM users WHERE expiry_date > %s", (current_time,))
+            return attach_urls(cursor, cursor.fetchall())
     except Exception as e:
         print(f"❌ Database error in get_active_users: {e}")
         return []
 
+@invalidates_user
 def update_user_api_credentials(phone: str, api_id: str, api_hash: str):
     """Update API credentials for a user"""
     try:
-        with db_lock:
-            with get_db_cursor() as cursor:
-                if cursor is None:
-                    return False
-                
-                cursor.execute("""
-                    UPDATE users SET api_id = %s, api_hash = %s WHERE phone = %s
-                """, (api_id, api_hash, phone))
-                return cursor.rowcount > 0
+        with get_db_cursor() as cursor:
+            if cursor is None:
+                return False
+            
+            cursor.execute("""
+                UPDATE users SET version = version + 1, api_id = %s, api_hash = %s WHERE phone = %s
+            """, (api_id, api_hash, phone))
+            return cursor.rowcount > 0
     except Exception as e:
         print(f"❌ Database error in update_user_api_credentials: {e}")
         return False
@@ -345,14 +1098,13 @@ def update_user_api_credentials(phone: str, api_id: str, api_hash: str):
 def user_exists(phone: str):
     """Check if user exists in database"""
     try:
-        with db_lock:
-            with get_db_cursor(commit=False) as cursor:
-                if cursor is None:
-                    return False
-                
-                cursor.execute("SELECT COUNT(*) as count FROM users WHERE phone = %s", (phone,))
-                result = cursor.fetchone()
-                return result['count'] > 0 if result else False
+        with get_db_cursor(commit=False) as cursor:
+            if cursor is None:
+                return False
+            
+            cursor.execute("SELECT COUNT(*) as count FROM users WHERE phone = %s", (phone,))
+            result = cursor.fetchone()
+            return result['count'] > 0 if result else False
     except Exception as e:
         print(f"❌ Database error in user_exists: {e}")
         return False
@@ -360,13 +1112,12 @@ def user_exists(phone: str):
 def get_users_with_forwarding_enabled():
     """Get users who have auto-forwarding enabled"""
     try:
-        with db_lock:
-            with get_db_cursor(commit=False) as cursor:
-                if cursor is None:
-                    return []
-                
-                cursor.execute("SELECT * FROM users WHERE auto_forwarding = TRUE")
-                return cursor.fetchall()
+        with get_db_cursor(commit=False) as cursor:
+            if cursor is None:
+                return []
+            
+            cursor.execute("SELECT * FROM users WHERE auto_forwarding = TRUE")
+            return attach_urls(cursor, cursor.fetchall())
     except Exception as e:
         print(f"❌ Database error in get_users_with_forwarding_enabled: {e}")
         return []
@@ -377,17 +1128,17 @@ def cleanup_expired_users(auto_delete=False):
         expired_users = get_expired_users()
         
         if auto_delete and expired_users:
-            with db_lock:
-                with get_db_cursor() as cursor:
-                    if cursor is None:
-                        return 0
-                    
-                    current_time = datetime.now()
-                    cursor.execute("DELETE FROM users WHERE expiry_date < %s", (current_time,))
-                    deleted_count = cursor.rowcount
-                    print(f"🧹 Cleaned up {deleted_count} expired users")
-                    return deleted_count
-                    
+            with get_db_cursor() as cursor:
+                if cursor is None:
+                    return 0
+                
+                current_time = datetime.now()
+                cursor.execute("DELETE FROM users WHERE expiry_date < %s", (current_time,))
+                deleted_count = cursor.rowcount
+            _user_cache.clear()
+            print(f"🧹 Cleaned up {deleted_count} expired users")
+            return deleted_count
+                
         return len(expired_users)
     except Exception as e:
         print(f"❌ Database error in cleanup_expired_users: {e}")
@@ -396,42 +1147,41 @@ def cleanup_expired_users(auto_delete=False):
 def get_database_stats():
     """Get database statistics"""
     try:
-        with db_lock:
-            with get_db_cursor(commit=False) as cursor:
-                if cursor is None:
-                    return {}
-                
-                stats = {}
-                current_time = datetime.now()
-                
-                # Total users
-                cursor.execute("SELECT COUNT(*) as count FROM users")
-                result = cursor.fetchone()
-                stats['total_users'] = result['count'] if result else 0
-                
-                # Active users
-                cursor.execute("SELECT COUNT(*) as count FROM users WHERE expiry_date > %s", (current_time,))
-                result = cursor.fetchone()
-                stats['active_users'] = result['count'] if result else 0
-                
-                # Users with forwarding enabled
-                cursor.execute("SELECT COUNT(*) as count FROM users WHERE auto_forwarding = TRUE")
-                result = cursor.fetchone()
-                stats['forwarding_enabled'] = result['count'] if result else 0
-                
-                # Users with URLs configured
-                cursor.execute("SELECT COUNT(*) as count FROM users WHERE urls != '[]' AND urls IS NOT NULL")
-                result = cursor.fetchone()
-                stats['users_with_urls'] = result['count'] if result else 0
-                
-                # Users with log channels
-                cursor.execute("SELECT COUNT(*) as count FROM users WHERE log_channel_id IS NOT NULL")
-                result = cursor.fetchone()
-                stats['users_with_log_channels'] = result['count'] if result else 0
-                
-                stats['expired_users'] = stats['total_users'] - stats['active_users']
-                
-                return stats
+        with get_db_cursor(commit=False) as cursor:
+            if cursor is None:
+                return {}
+            
+            stats = {}
+            current_time = datetime.now()
+            
+            # Total users
+            cursor.execute("SELECT COUNT(*) as count FROM users")
+            result = cursor.fetchone()
+            stats['total_users'] = result['count'] if result else 0
+            
+            # Active users
+            cursor.execute("SELECT COUNT(*) as count FROM users WHERE expiry_date > %s", (current_time,))
+            result = cursor.fetchone()
+            stats['active_users'] = result['count'] if result else 0
+            
+            # Users with forwarding enabled
+            cursor.execute("SELECT COUNT(*) as count FROM users WHERE auto_forwarding = TRUE")
+            result = cursor.fetchone()
+            stats['forwarding_enabled'] = result['count'] if result else 0
+            
+            # Users with URLs configured
+            cursor.execute("SELECT COUNT(DISTINCT user_id) as count FROM targets")
+            result = cursor.fetchone()
+            stats['users_with_urls'] = result['count'] if result else 0
+            
+            # Users with log channels
+            cursor.execute("SELECT COUNT(*) as count FROM users WHERE log_channel_id IS NOT NULL")
+            result = cursor.fetchone()
+            stats['users_with_log_channels'] = result['count'] if result else 0
+            
+            stats['expired_users'] = stats['total_users'] - stats['active_users']
+            
+            return stats
     except Exception as e:
         print(f"❌ Database error in get_database_stats: {e}")
         return {}
@@ -481,15 +1231,14 @@ def backup_database(backup_path: str = None):
 def optimize_database():
     """Optimize database performance"""
     try:
-        with db_lock:
-            with get_db_cursor() as cursor:
-                if cursor is None:
-                    return False
-                
-                cursor.execute("OPTIMIZE TABLE users")
-                cursor.execute("ANALYZE TABLE users")
-                print("✅ Database optimized")
-                return True
+        with get_db_cursor() as cursor:
+            if cursor is None:
+                return False
+            
+            cursor.execute("OPTIMIZE TABLE users")
+            cursor.execute("ANALYZE TABLE users")
+            print("✅ Database optimized")
+            return True
     except Exception as e:
         print(f"❌ Database optimization error: {e}")
         return False
@@ -497,14 +1246,14 @@ def optimize_database():
 def test_connection():
     """Test database connection"""
     try:
-        conn = get_db_connection()
-        if conn:
-            conn.close()
+        with get_db_cursor(commit=False) as cursor:
+            if cursor is None:
+                print("❌ Database connection failed")
+                return False
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
             print("✅ Database connection successful")
             return True
-        else:
-            print("❌ Database connection failed")
-            return False
     except Exception as e:
         print(f"❌ Database connection test error: {e}")
         return False
@@ -551,14 +1300,17 @@ def get_database_info():
 def reset_database():
     """Reset database by dropping and recreating the users table"""
     try:
-        with db_lock:
-            with get_db_cursor() as cursor:
-                if cursor is None:
-                    return False
-                
-                cursor.execute("DROP TABLE IF EXISTS users")
-                print("✅ Users table dropped")
-                
+        with get_db_cursor() as cursor:
+            if cursor is None:
+                return False
+            
+            cursor.execute("DROP TABLE IF EXISTS target_health")
+            cursor.execute("DROP TABLE IF EXISTS resolved_peers")
+            cursor.execute("DROP TABLE IF EXISTS targets")
+            cursor.execute("DROP TABLE IF EXISTS users")
+            print("✅ Users table dropped")
+            
+        _user_cache.clear()
         # Recreate the table
         init_db()
         return True
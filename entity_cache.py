@@ -0,0 +1,171 @@
+# ================== ENTITY_CACHE.PY ==================
+import json
+import os
+import time
+from collections import OrderedDict
+
+from telethon import utils
+from telethon.tl.types import InputPeerChannel, InputPeerChat, InputPeerUser
+
+import database
+from config import ENTITY_CACHE_TTL, ENTITY_CACHE_SIZE
+
+
+def cache_key(group_identifier, chat_id=None, url_type="unknown"):
+    """Build a stable cache key for a parsed target (topics share their chat's key)"""
+    if chat_id:
+        return f"id:{chat_id}"
+    if url_type == "chat_id" or str(group_identifier).lstrip("-").isdigit():
+        return f"id:{int(group_identifier)}"
+    return f"user:{str(group_identifier).lstrip('@').lower()}"
+
+
+def peer_to_record(entity):
+    """Convert a resolved entity into a (peer_type, peer_id, access_hash) record"""
+    peer = utils.get_input_peer(entity)
+    if isinstance(peer, InputPeerChannel):
+        return "channel", peer.channel_id, peer.access_hash
+    if isinstance(peer, InputPeerChat):
+        return "chat", peer.chat_id, 0
+    if isinstance(peer, InputPeerUser):
+        return "user", peer.user_id, peer.access_hash
+    return None
+
+
+def record_to_peer(peer_type, peer_id, access_hash):
+    """Build an InputPeer from a stored record without any network call"""
+    if peer_type == "channel":
+        return InputPeerChannel(channel_id=peer_id, access_hash=access_hash)
+    if peer_type == "chat":
+        return InputPeerChat(chat_id=peer_id)
+    if peer_type == "user":
+        return InputPeerUser(user_id=peer_id, access_hash=access_hash)
+    return None
+
+
+class EntityCache:
+    """Per-account LRU/TTL cache of resolved target peers.
+
+    Persisted next to the session file and in the resolved_peers table, so a
+    fresh worker can build InputPeers without any get_entity call.
+    """
+
+    def __init__(self, phone, ttl=ENTITY_CACHE_TTL, max_size=ENTITY_CACHE_SIZE):
+        self.phone = phone
+        self.path = f"sessions/{phone}.entities.json"
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> [peer_type, peer_id, access_hash, stored_at]
+        self._dirty = False
+        self._resolved = set()  # Keys to write to the database on the next sync_db()
+        self._invalidated = set()  # Keys to delete from the database on the next sync_db()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def load(self):
+        """Load cached peers from disk, dropping expired entries"""
+        try:
+            if not os.path.exists(self.path):
+                return
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            now = time.time()
+            for key, record in data.items():
+                if now - record[3] < self.ttl:
+                    self._entries[key] = record
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            print(f"📦 {self.phone}: Loaded {len(self._entries)} cached peers")
+        except Exception as e:
+            print(f"⚠️ {self.phone}: Failed to load entity cache: {e}")
+            self._entries.clear()
+
+    def seed(self, rows):
+        """Add peers stored in the database, keeping the time each was resolved.
+
+        Rows hold cache_key, peer_type, peer_id, access_hash and resolved_at
+        (epoch seconds). Expired rows are skipped, and a newer entry from the
+        local file is kept.
+        """
+        now = time.time()
+        seeded = 0
+        for row in rows:
+            stored_at = float(row.get("resolved_at") or now)
+            key = row["cache_key"]
+            current = self._entries.get(key)
+            if now - stored_at >= self.ttl or (current is not None and current[3] >= stored_at):
+                continue
+            self._entries[key] = [row["peer_type"], row["peer_id"], row["access_hash"], stored_at]
+            self._entries.move_to_end(key)
+            seeded += 1
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        if seeded:
+            self._dirty = True
+            print(f"📦 {self.phone}: Loaded {seeded} stored peers from the database")
+
+    def sync_db(self):
+        """Write peers resolved or rejected since the last sync to the database"""
+        if not self._resolved and not self._invalidated:
+            return
+        resolved, invalidated = self._resolved, self._invalidated
+        self._resolved, self._invalidated = set(), set()
+        upserts = [(key, *self._entries[key]) for key in resolved if key in self._entries]
+        deletes = [key for key in invalidated if key not in self._entries]
+        if not database.save_resolved_peers(self.phone, upserts, deletes):
+            self._resolved |= resolved  # Retry with the next sync
+            self._invalidated |= invalidated
+
+    def save(self, force=False):
+        """Write the cache to disk if it changed since the last save"""
+        if not self._dirty and not force:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+        except Exception as e:
+            print(f"⚠️ {self.phone}: Failed to save entity cache: {e}")
+
+    def get(self, key):
+        """Return a cached InputPeer for key, or None on miss/expiry"""
+        record = self._entries.get(key)
+        if record is None:
+            self.misses += 1
+            return None
+        if time.time() - record[3] >= self.ttl:
+            self.invalidate(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return record_to_peer(record[0], record[1], record[2])
+
+    def peer_of(self, key):
+        """(peer_type, peer_id) cached for key, or None; does not count as a lookup"""
+        record = self._entries.get(key)
+        return (record[0], record[1]) if record else None
+
+    def put(self, key, entity):
+        """Store the InputPeer form of a freshly resolved entity"""
+        record = peer_to_record(entity)
+        if record is None:
+            return
+        self._entries[key] = [record[0], record[1], record[2], time.time()]
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        self._dirty = True
+        self._resolved.add(key)
+
+    def invalidate(self, key):
+        """Forget a cached peer (e.g. after ChannelPrivateError or a rejected access_hash)"""
+        if self._entries.pop(key, None) is not None:
+            self._dirty = True
+            self._invalidated.add(key)
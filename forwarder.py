@@ -1,82 +1,110 @@
 # forwarder.py
 import asyncio
+import heapq
 import os
 import time
-import re
 import json
+import zlib
 import signal
-from telethon import TelegramClient
-from telethon.tl.functions.messages import GetHistoryRequest, ForwardMessagesRequest
+import sys
+import types
+import logging
+from collections import Counter, deque
+from datetime import datetime, timedelta
+from telethon import TelegramClient, events
+from telethon.tl.functions.messages import GetHistoryRequest, ForwardMessagesRequest, SearchRequest
+from telethon.tl.types import InputMessagesFilterPinned
 from telethon.errors import (
     ChatAdminRequiredError,
     UserBannedInChannelError,
     FloodWaitError,
+    SlowModeWaitError,
     ChannelPrivateError,
+    ChannelInvalidError,
+    ChatIdInvalidError,
+    PeerIdInvalidError,
+    UsernameInvalidError,
+    UsernameNotOccupiedError,
     AuthKeyError,
     SessionPasswordNeededError,
 )
 from telegram import Bot
+import async_database
 import database
-from config import ADMIN_LOG_CHANNEL, BOT_TOKEN
-
-# =============================
-# URL Parsing
-# =============================
-def parse_telegram_url(url):
-    try:
-        url = url.strip()
-        patterns = [
-            (r"https?://t\.me/c/(-?\d+)/(\d+)/?$", "private_topic"),
-            (r"https?://t\.me/c/(-?\d+)/?$", "private_channel"),
-            (r"https?://t\.me/([^/c][^/]+)/(\d+)/?$", "public_topic"),
-            (r"https?://t\.me/([^/c][^/]+)/?$", "public"),
-            (r"^@([^/]+)/?$", "username"),
-            (r"^(-?\d+)$", "chat_id"),
-        ]
-        for pattern, url_type in patterns:
-            match = re.match(pattern, url)
-            if match:
-                if url_type == "private_topic":
-                    chat_id = int(match.group(1))
-                    if chat_id > 0:
-                        chat_id = int("-100" + str(chat_id))
-                    topic_id = int(match.group(2))
-                    return str(chat_id), topic_id, url_type, chat_id
-                elif url_type == "private_channel":
-                    chat_id = int(match.group(1))
-                    if chat_id > 0:
-                        chat_id = int("-100" + str(chat_id))
-                    return str(chat_id), None, url_type, chat_id
-                elif url_type == "public_topic":
-                    username = match.group(1)
-                    topic_id = int(match.group(2))
-                    return username, topic_id, url_type, None
-                elif url_type in ["public", "username"]:
-                    username = match.group(1)
-                    return username, None, url_type, None
-                elif url_type == "chat_id":
-                    chat_id = int(match.group(1))
-                    return str(chat_id), None, url_type, chat_id
-        return url, None, "unknown", None
-    except Exception as e:
-        print(f"❌ Parse URL error: {e}")
-        return url, None, "unknown", None
+import local_store
+from config import (
+    ADMIN_LOG_CHANNEL,
+    BOT_TOKEN,
+    FORWARD_CONCURRENCY,
+    FORWARD_PACING,
+    ACCOUNT_FLOOD_WAIT_THRESHOLD,
+    SAVED_RECONCILE_INTERVAL,
+    SYNC_OVERLAP_SECONDS,
+    SUPERVISOR_BATCH_SIZE,
+    SUPERVISOR_FULL_SCAN_INTERVAL,
+    SCHEDULER_POOL_SIZE,
+    FORWARDER_SHARDS,
+    TARGET_QUARANTINE_THRESHOLD,
+    TARGET_QUARANTINE_BASE,
+    TARGET_QUARANTINE_MAX,
+    SAVED_WINDOW_SIZE,
+    STARTUP_CONNECT_CONCURRENCY,
+    CHECKPOINT_INTERVAL,
+    PACING_MIN_INTERVAL,
+    PACING_MAX_INTERVAL,
+    PACING_SUCCESS_STEP,
+    PACING_SUCCESSES_PER_STEP,
+    PACING_BACKOFF_FACTOR,
+    ADAPTIVE_CADENCE_MAX,
+    SAVED_MESSAGES_EVENTS,
+    CLIENT_ENTITY_CACHE_LIMIT,
+    CLIENT_MEMORY_SAMPLE_INTERVAL,
+    CLIENT_MEMORY_SAMPLES_PER_STATUS,
+    CLIENT_MEMORY_MAX_OBJECTS,
+    TARGET_MIN_GAP,
+    TARGET_HOURLY_CAP,
+)
+from entity_cache import EntityCache, cache_key
+from targets import compile_targets, parse_telegram_url
+from shards import ShardHost, shard_of
+from log_dispatcher import LogDispatcher
 
+# Errors meaning a cached peer is no longer usable and must be re-resolved
+PEER_INVALID_ERRORS = (
+    ChannelPrivateError,
+    ChannelInvalidError,
+    ChatIdInvalidError,
+    PeerIdInvalidError,
+    UsernameInvalidError,
+    UsernameNotOccupiedError,
+)
 
 # =============================
 # Resolve Entity
 # =============================
-async def resolve_entity_advanced(client, group_identifier, chat_id=None, url_type="unknown"):
+async def resolve_entity_advanced(client, group_identifier, chat_id=None, url_type="unknown", cache=None, key=None):
+    key = key or cache_key(group_identifier, chat_id, url_type)
+    if cache is not None:
+        peer = cache.get(key)
+        if peer is not None:
+            return peer
+
     try:
+        entity = None
         if url_type in ["private_channel", "private_topic"]:
             if chat_id:
-                return await client.get_entity(chat_id)
+                entity = await client.get_entity(chat_id)
         elif url_type == "chat_id":
-            return await client.get_entity(int(group_identifier))
+            entity = await client.get_entity(int(group_identifier))
         else:
             if not group_identifier.startswith("@") and not group_identifier.lstrip("-").isdigit():
-                return await client.get_entity("@" + group_identifier)
-            return await client.get_entity(group_identifier)
+                entity = await client.get_entity("@" + group_identifier)
+            else:
+                entity = await client.get_entity(group_identifier)
+
+        if cache is not None and entity is not None:
+            cache.put(key, entity)
+        return entity
     except Exception as e:
         print(f"❌ Resolve entity error for {group_identifier}: {e}")
         raise
@@ -85,306 +113,1592 @@ async def resolve_entity_advanced(client, group_identifier, chat_id=None, url_ty
 # =============================
 # Forwarding Logic
 # =============================
-async def forward_messages_enhanced(client, urls, loop_count):
+OUTCOME_SUCCESS = "success"
+OUTCOME_FAILED = "failed"
+OUTCOME_DEFERRED = "deferred"
+OUTCOME_QUARANTINED = "quarantined"
+OUTCOME_SKIPPED = "skipped"
+
+
+async def forward_messages_enhanced(
+    client,
+    targets,
+    loop_count,
+    entity_cache=None,
+    mode="sequential",
+    concurrency=FORWARD_CONCURRENCY,
+    pacing=FORWARD_PACING,
+    flood=None,
+    saved=None,
+    health=None,
+    ledger=None,
+    content_mode="single",
+    content_count=1,
+    pacer=None,
+    registry=None,
+    account=None,
+    reuse_batch=False,
+):
+    """Forward the latest Saved Message(s) to every Target; returns a Counter of outcomes"""
+    flood = flood if flood is not None else FloodScheduler()
+    reserved = {}  # target url -> (group, slot time) taken in the shared registry
     try:
-        print("🔍 Fetching latest message from Saved Messages...")
-
-        saved_messages = await client(
-            GetHistoryRequest(
-                peer="me",
-                offset_id=0,
-                offset_date=None,
-                add_offset=0,
-                limit=1,
-                max_id=0,
-                min_id=0,
-                hash=0,
+        if saved is not None:
+            messages = await saved.get_batch(content_mode, content_count, reuse=reuse_batch)
+        elif content_mode == "marked":
+            messages = (await fetch_marked_messages(client, content_count))[::-1]
+        else:
+            messages = select_batch(
+                await fetch_saved_messages(client, batch_limit(content_mode, content_count)),
+                content_mode, content_count,
             )
-        )
 
-        if not saved_messages.messages:
+        if not messages:
             print("❌ No messages found in Saved Messages")
-            return 0, len(urls)
+            return Counter({OUTCOME_FAILED: len(targets)})
+        latest_message = messages[-1]
 
-        latest_message = saved_messages.messages[0]
+        text = next((m.message for m in messages if m.message), None)
         message_preview = (
-            latest_message.message[:50] + "..."
-            if latest_message.message and len(latest_message.message) > 50
-            else latest_message.message or "[Media/File]"
+            text[:50] + "..." if text and len(text) > 50 else text or "[Media/File]"
         )
 
-        print(f"📨 Message preview: {message_preview}")
-        print(f"🚀 Forwarding to {len(urls)} targets...")
+        print(f"📨 Message preview: {message_preview} ({len(messages)} message(s))")
+        width = concurrency if mode == "concurrent" else 1
+        print(f"🚀 Forwarding to {len(targets)} targets ({mode}, {width} at a time)...")
 
-        success_count = 0
-        failed_count = 0
+        def withdraw(target):
+            # A parked account must not hold a shared slot for the others
+            if registry is not None:
+                registry.withdraw(group_key(target, entity_cache), account)
 
-        for i, group_url in enumerate(urls, 1):
-            try:
-                group_identifier, topic_id, url_type, chat_id = parse_telegram_url(group_url)
-                entity = await resolve_entity_advanced(client, group_identifier, chat_id, url_type)
-
-                if topic_id:
-                    await client(
-                        ForwardMessagesRequest(
-                            from_peer="me",
-                            id=[latest_message.id],
-                            to_peer=entity,
-                            top_msg_id=topic_id,
-                        )
-                    )
-                    print(f"[{i}] ✓ FORWARDED to topic {topic_id}")
-                else:
-                    await client.forward_messages(
-                        entity=entity, messages=latest_message.id, from_peer="me"
-                    )
-                    print(f"[{i}] ✓ FORWARDED")
-
-                success_count += 1
-                # Small delay between forwards to avoid flooding
-                await asyncio.sleep(0.1)
-
-            except FloodWaitError as e:
-                wait_time = e.seconds
-                print(f"⚠ FLOOD WAIT - Waiting {wait_time}s...")
-                await asyncio.sleep(wait_time + 1)
-                failed_count += 1
-            except (ChannelPrivateError, ChatAdminRequiredError, UserBannedInChannelError) as e:
-                print(f"❌ ACCESS DENIED for URL {group_url}: {e}")
-                failed_count += 1
-            except Exception as e:
-                print(f"❌ FAILED for URL {group_url}: {e}")
-                failed_count += 1
+        def precheck(target):
+            if ledger is not None and ledger.should_skip(target.url, latest_message.id):
+                return OUTCOME_SKIPPED  # Already has this message, re-post interval not reached
+            if health is not None and health.is_quarantined(target.url):
+                withdraw(target)
+                return OUTCOME_QUARANTINED  # Dead target: no API call until its probe time
+            if flood.is_parked(target.url):
+                # Throttled target (or account): keep it queued, no API call
+                flood.defer(target.url)
+                withdraw(target)
+                return OUTCOME_DEFERRED
+            flood.release(target.url)
+            if registry is not None:
+                group = group_key(target, entity_cache)
+                slot = registry.acquire(group, account)
+                if slot is None:
+                    return OUTCOME_SKIPPED  # Another account posted here recently
+                reserved[target.url] = (group, slot)
+            return None
+
+        async def send(i, target):
+            outcome = await forward_to_target(client, messages, i, target, entity_cache, flood, health, pacer)
+            if outcome == OUTCOME_SUCCESS and ledger is not None:
+                ledger.record(target.url, latest_message.id)
+            if outcome != OUTCOME_SUCCESS and target.url in reserved:
+                group, slot = reserved[target.url]
+                registry.cancel(group, account, slot)
+            return outcome
 
-        return success_count, failed_count
+        results = await fan_out(targets, send, concurrency=width, pacing=pacing, precheck=precheck, pacer=pacer)
+        return Counter(results)
 
     except Exception as e:
         print(f"❌ Critical error in forward_messages_enhanced: {e}")
-        return 0, len(urls)
+        return Counter({OUTCOME_FAILED: len(targets)})
+
+
+async def forward_to_target(client, messages, i, target, entity_cache=None, flood=None, health=None, pacer=None):
+    """Forward the messages to one Target in a single request; returns one of the OUTCOME_* values"""
+    group_url, topic_id = target.url, target.topic_id
+    message_ids = [message.id for message in messages]
+    try:
+        entity = await resolve_entity_advanced(
+            client, target.identifier, target.chat_id, target.url_type, cache=entity_cache, key=target.key
+        )
+
+        if topic_id:
+            await client(
+                ForwardMessagesRequest(
+                    from_peer="me",
+                    id=message_ids,
+                    to_peer=entity,
+                    top_msg_id=topic_id,
+                )
+            )
+            print(f"[{i}] ✓ FORWARDED to topic {topic_id}")
+        else:
+            await client.forward_messages(
+                entity=entity, messages=message_ids, from_peer="me"
+            )
+            print(f"[{i}] ✓ FORWARDED")
+        if health is not None:
+            health.record_success(group_url)
+        if pacer is not None:
+            pacer.on_success()
+        return OUTCOME_SUCCESS
+
+    except SlowModeWaitError as e:
+        print(f"⏳ SLOW MODE for URL {group_url} - retrying in {e.seconds}s")
+        if flood is None:
+            return OUTCOME_FAILED
+        flood.park(group_url, e.seconds)
+        return OUTCOME_DEFERRED
+    except FloodWaitError as e:
+        if pacer is not None:
+            pacer.on_flood(e.seconds)
+        if flood is None:
+            return OUTCOME_FAILED
+        if e.seconds >= ACCOUNT_FLOOD_WAIT_THRESHOLD:
+            print(f"⚠ ACCOUNT FLOOD WAIT {e.seconds}s - deferring remaining targets")
+            flood.park_account(e.seconds)
+        else:
+            print(f"⚠ FLOOD WAIT for URL {group_url} - retrying in {e.seconds}s")
+        flood.park(group_url, e.seconds)
+        return OUTCOME_DEFERRED
+    except PEER_INVALID_ERRORS as e:
+        print(f"❌ PEER INVALID for URL {group_url}: {e}")
+        if entity_cache is not None:
+            entity_cache.invalidate(target.key)
+        error = e
+    except (ChatAdminRequiredError, UserBannedInChannelError) as e:
+        print(f"❌ ACCESS DENIED for URL {group_url}: {e}")
+        error = e
+    except Exception as e:
+        # Message-level or transient error: says nothing about the target itself
+        print(f"❌ FAILED for URL {group_url}: {e}")
+        return OUTCOME_FAILED
+
+    if health is not None:
+        health.record_failure(group_url, type(error).__name__)
+    return OUTCOME_FAILED
 
 
 # =============================
-# Worker (per user)
+# Client Profile
 # =============================
-async def user_worker(user_conf, bot_logger, stop_event: asyncio.Event):
-    api_id = int(user_conf["api_id"])
-    api_hash = user_conf["api_hash"]
-    phone = user_conf["phone"]
-    urls = json.loads(user_conf.get("urls") or "[]")
-    delay = int(user_conf.get("delay") or 5)
-    user_log_channel = user_conf.get("log_channel_id") or None
-    auto_forwarding = bool(user_conf.get("auto_forwarding"))
+def build_client(phone, api_id, api_hash, receive_updates=SAVED_MESSAGES_EVENTS):
+    """TelegramClient for a forwarding worker.
 
-    if not auto_forwarding:
-        print(f"⏸ User {phone}: auto_forwarding is OFF. Worker stopped.")
-        return
+    Send-only unless receive_updates: the client neither processes the
+    account's update stream nor catches up on connect, and keeps a small
+    in-memory entity cache (target peers live in EntityCache instead).
+    """
+    return TelegramClient(
+        f"sessions/{phone}",
+        int(api_id),
+        api_hash,
+        receive_updates=receive_updates,
+        catch_up=False,
+        entity_cache_limit=CLIENT_ENTITY_CACHE_LIMIT,
+    )
 
-    if not urls:
-        print(f"⚠️ User {phone}: No URLs configured. Worker stopped.")
-        return
 
-    session_path = f"sessions/{phone}"
-    os.makedirs("sessions", exist_ok=True)
+# Shared by every client (or not owned by one): not counted in its footprint
+_SIZE_SKIP_TYPES = (
+    type,
+    types.ModuleType,
+    types.FunctionType,
+    types.MethodType,
+    types.BuiltinFunctionType,
+    logging.Logger,
+    logging.Manager,
+    logging.Handler,
+    asyncio.AbstractEventLoop,
+    asyncio.Future,
+)
+
+
+def approx_size(obj, max_objects=CLIENT_MEMORY_MAX_OBJECTS):
+    """Approximate deep size in bytes of an object graph (instance dicts, slots, containers)"""
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack and len(seen) < max_objects:
+        current = stack.pop()
+        if id(current) in seen or isinstance(current, _SIZE_SKIP_TYPES):
+            continue
+        seen.add(id(current))
+        try:
+            total += sys.getsizeof(current)
+        except TypeError:
+            continue
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset, deque)):
+            stack.extend(current)
+        if hasattr(current, "__dict__"):
+            stack.append(current.__dict__)
+        for slot in getattr(type(current), "__slots__", ()):
+            if hasattr(current, slot):
+                stack.append(getattr(current, slot))
+    return total
+
 
-    client = None
+def process_rss():
+    """Resident memory of this process in bytes (0 if unavailable)"""
     try:
-        client = TelegramClient(session_path, api_id, api_hash)
-        
-        # Configure client to handle connection issues better
-        await client.start()
-        
-        if not await client.is_user_authorized():
-            print(f"❌ User {phone}: Not authorized, skipping...")
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+
+        # Peak rather than current RSS, but the best available off Linux
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except Exception:
+        return 0
+
+
+# =============================
+# Saved Messages Tracking
+# =============================
+async def fetch_saved_messages(client, limit=1):
+    """Fetch the newest Saved Messages (newest first) with a single GetHistoryRequest"""
+    print("🔍 Fetching latest message from Saved Messages...")
+    saved_messages = await client(
+        GetHistoryRequest(
+            peer="me",
+            offset_id=0,
+            offset_date=None,
+            add_offset=0,
+            limit=limit,
+            max_id=0,
+            min_id=0,
+            hash=0,
+        )
+    )
+    return list(saved_messages.messages)
+
+
+async def fetch_marked_messages(client, limit=1):
+    """Fetch the newest pinned Saved Messages (newest first) with a single search request"""
+    print("🔍 Fetching pinned messages from Saved Messages...")
+    found = await client(
+        SearchRequest(
+            peer="me",
+            q="",
+            filter=InputMessagesFilterPinned(),
+            min_date=None,
+            max_date=None,
+            offset_id=0,
+            add_offset=0,
+            limit=limit,
+            max_id=0,
+            min_id=0,
+            hash=0,
+        )
+    )
+    return list(found.messages)
+
+
+async def fetch_latest_saved_message(client):
+    """Fetch the newest Saved Message with a single GetHistoryRequest"""
+    messages = await fetch_saved_messages(client, 1)
+    return messages[0] if messages else None
+
+
+def select_batch(recent, content_mode="single", count=1):
+    """Pick what to forward from recent messages (newest first); returns oldest first.
+
+    single: the latest message; album: every message of the latest message's
+    grouped_id album; recent: the last `count` messages. The "marked" mode
+    (pinned messages) is fetched separately, see fetch_marked_messages.
+    """
+    if not recent:
+        return []
+    if content_mode == "album" and getattr(recent[0], "grouped_id", None):
+        grouped_id = recent[0].grouped_id
+        batch = []
+        for message in recent:
+            if getattr(message, "grouped_id", None) != grouped_id:
+                break
+            batch.append(message)
+        return batch[::-1]
+    if content_mode == "recent":
+        return recent[:max(1, count)][::-1]
+    return recent[:1]
+
+
+def batch_limit(content_mode="single", count=1, window=SAVED_WINDOW_SIZE):
+    """How many of the newest Saved Messages select_batch needs for a content mode"""
+    if content_mode == "album":
+        return window
+    if content_mode == "recent":
+        return min(max(1, count), window)
+    return 1
+
+
+class SavedMessagesTracker:
+    """Caches the newest Saved Messages, kept current by update events on "me".
+
+    A periodic GetHistoryRequest reconciles the cache in case an update was
+    missed; deleting a cached message forces a refetch on the next tick.
+    Without live events (send-only clients) every full loop refetches just
+    what its content mode needs, and deferred retries reuse that fetch.
+    """
+
+    def __init__(
+        self, client, reconcile_interval=SAVED_RECONCILE_INTERVAL, window=SAVED_WINDOW_SIZE,
+        live=SAVED_MESSAGES_EVENTS,
+    ):
+        self.client = client
+        self.reconcile_interval = reconcile_interval
+        self.window = window
+        self.live = live
+        self.recent = []  # Newest first, at most `window` messages
+        self._fetched = 0  # Limit of the last fetch
+        self.marked = []  # Newest pinned messages first, for the "marked" content mode
+        self._marked_fetched = 0
+        self._stale = True
+        self._last_reconcile = 0.0
+        self._handlers = []
+
+    async def start(self):
+        if not self.live:
+            return
+        me = await self.client.get_me(input_peer=True)
+        self_chat = [me.user_id]
+        self._handlers = [
+            (self._on_new_message, events.NewMessage(chats=self_chat)),
+            (self._on_edited_message, events.MessageEdited(chats=self_chat)),
+            # Deletions in private chats carry no chat id, so match on message ids
+            (self._on_deleted_message, events.MessageDeleted()),
+        ]
+        for callback, event in self._handlers:
+            self.client.add_event_handler(callback, event)
+
+    def stop(self):
+        for callback, event in self._handlers:
+            try:
+                self.client.remove_event_handler(callback, event)
+            except Exception:
+                pass
+        self._handlers = []
+
+    @property
+    def latest(self):
+        return self.recent[0] if self.recent else None
+
+    async def _on_new_message(self, event):
+        message = event.message
+        if any(cached.id == message.id for cached in self.recent):
+            return
+        self.recent.append(message)
+        self.recent.sort(key=lambda cached: cached.id, reverse=True)
+        del self.recent[self.window:]
+
+    async def _on_edited_message(self, event):
+        for index, cached in enumerate(self.recent):
+            if cached.id == event.message.id:
+                self.recent[index] = event.message
+
+    async def _on_deleted_message(self, event):
+        deleted = set(event.deleted_ids or [])
+        if any(cached.id in deleted for cached in self.recent):
+            self._stale = True
+
+    async def reconcile(self, limit=None):
+        self._fetched = limit or self.window
+        self.recent = await fetch_saved_messages(self.client, self._fetched)
+        self._stale = False
+        self._last_reconcile = time.time()
+
+    async def _refresh(self, limit=1, reuse=False):
+        if self.live:
+            if self._stale or time.time() - self._last_reconcile >= self.reconcile_interval:
+                await self.reconcile()
+        elif not reuse or self._stale or self._fetched < limit:
+            await self.reconcile(limit)
+
+    async def get_latest(self):
+        await self._refresh()
+        return self.latest
+
+    async def get_batch(self, content_mode="single", count=1, reuse=False):
+        """Messages to forward for a content mode, oldest first.
+
+        reuse: without live events, pick from the last fetch when it covers
+        the content mode instead of fetching again (deferred retries).
+        Pinned messages ("marked") are not tracked by events: every full
+        loop searches for them and deferred retries reuse the result.
+        """
+        if content_mode == "marked":
+            if not reuse or self._marked_fetched < count:
+                self.marked = await fetch_marked_messages(self.client, count)
+                self._marked_fetched = count
+            return self.marked[:count][::-1]
+        await self._refresh(batch_limit(content_mode, count, self.window), reuse)
+        return select_batch(self.recent, content_mode, count)
+
+
+# =============================
+# Flood Wait Scheduling
+# =============================
+class FloodScheduler:
+    """Per-account deferred queue for targets parked by FloodWait/SlowMode errors.
+
+    Only the throttled target is parked, unless Telegram's wait is long enough
+    to be account-wide, in which case every target waits for the account.
+    """
+
+    def __init__(self):
+        self.account_until = 0.0
+        self._parked = {}  # target -> due time
+        self._heap = []  # (due time, target), may hold stale entries
+
+    def __len__(self):
+        return len(self._parked)
+
+    def park(self, target, seconds):
+        due = max(time.time() + seconds + 1, self.account_until)
+        self._parked[target] = due
+        heapq.heappush(self._heap, (due, target))
+
+    def park_account(self, seconds):
+        self.account_until = max(self.account_until, time.time() + seconds + 1)
+
+    def defer(self, target):
+        """Keep a target queued until both its own and the account wait expire"""
+        due = max(self._parked.get(target, 0.0), self.account_until)
+        if self._parked.get(target) != due:
+            self._parked[target] = due
+            heapq.heappush(self._heap, (due, target))
+
+    def release(self, target):
+        self._parked.pop(target, None)
+
+    def snapshot(self):
+        """Parked targets and the account wait, for checkpointing"""
+        return dict(self._parked), self.account_until
+
+    def restore(self, parked, account_until=0.0, now=None):
+        """Re-park targets from a checkpoint, dropping waits that already expired"""
+        now = now or time.time()
+        self.account_until = max(self.account_until, account_until)
+        for target, due in parked.items():
+            if due > now:
+                self._parked[target] = due
+                heapq.heappush(self._heap, (due, target))
+
+    def is_parked(self, target, now=None):
+        now = now or time.time()
+        return self.account_until > now or self._parked.get(target, 0.0) > now
+
+    def next_due(self):
+        """Earliest time a parked target becomes retryable, or None"""
+        while self._heap and self._parked.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now=None):
+        """Remove and return every parked target whose wait has expired"""
+        now = now or time.time()
+        due_targets = []
+        while self._heap and self._heap[0][0] <= now:
+            due, target = heapq.heappop(self._heap)
+            if self._parked.get(target) == due:
+                del self._parked[target]
+                due_targets.append(target)
+        return due_targets
+
+
+# =============================
+# Target Health
+# =============================
+class TargetHealth:
+    """Failure streak, last error and quarantine window per target of one account.
+
+    After TARGET_QUARANTINE_THRESHOLD failures in a row a target is skipped
+    until its probe time; every failed probe doubles the window. State is
+    persisted in the target_health table so quarantine survives restarts.
+    """
+
+    def __init__(
+        self,
+        phone,
+        threshold=TARGET_QUARANTINE_THRESHOLD,
+        base=TARGET_QUARANTINE_BASE,
+        max_window=TARGET_QUARANTINE_MAX,
+    ):
+        self.phone = phone
+        self.threshold = threshold
+        self.base = base
+        self.max_window = max_window
+        self._records = {}  # target -> [failures, last_error, probe_after]
+        self._dirty = set()
+
+    def __len__(self):
+        return len(self._records)
+
+    def load(self):
+        for row in database.get_target_health(self.phone):
+            probe_after = row["probe_after"].timestamp() if row["probe_after"] else 0.0
+            self._records[row["target"]] = [row["failures"], row["last_error"], probe_after]
+
+    def save(self):
+        """Persist targets whose health changed since the last save"""
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+        records = []
+        for target in dirty:
+            failures, last_error, probe_after = self._records.get(target, [0, None, 0.0])
+            probe_at = datetime.fromtimestamp(probe_after) if probe_after else None
+            records.append((target, failures, last_error, probe_at))
+        if not database.save_target_health(self.phone, records):
+            self._dirty |= dirty  # Retry with the next save
+
+    def is_quarantined(self, target, now=None):
+        record = self._records.get(target)
+        return record is not None and record[2] > (now or time.time())
+
+    def quarantined_count(self, now=None):
+        now = now or time.time()
+        return sum(1 for record in self._records.values() if record[2] > now)
+
+    def record_success(self, target):
+        if self._records.pop(target, None) is not None:
+            self._dirty.add(target)
+
+    def record_failure(self, target, error_name):
+        record = self._records.setdefault(target, [0, None, 0.0])
+        record[0] += 1
+        record[1] = error_name
+        if record[0] >= self.threshold:
+            window = min(self.max_window, self.base * 2 ** (record[0] - self.threshold))
+            record[2] = time.time() + window
+            print(f"🚫 {self.phone}: Quarantined {target} for {int(window)}s after {record[0]} failures ({error_name})")
+        self._dirty.add(target)
+
+
+# =============================
+# Forward Ledger
+# =============================
+class ForwardLedger:
+    """Last forwarded message id and time per target of one account.
+
+    A target that already received the current Saved Message less than
+    min_interval seconds ago is skipped; stored in the local SQLite store.
+    """
+
+    def __init__(self, phone, min_interval=0):
+        self.phone = phone
+        self.min_interval = min_interval
+        self._entries = {}  # target -> (message_id, sent_at)
+        self._dirty = set()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def load(self, targets=None):
+        if targets is not None:
+            local_store.prune_ledger(self.phone, set(targets))
+        self._entries = local_store.get_ledger(self.phone)
+
+    def save(self):
+        if not self._dirty:
             return
+        dirty, self._dirty = self._dirty, set()
+        entries = [(target, *self._entries[target]) for target in dirty]
+        if not local_store.save_ledger(self.phone, entries):
+            self._dirty |= dirty
+
+    def should_skip(self, target, message_id, now=None):
+        entry = self._entries.get(target)
+        if entry is None or entry[0] != message_id:
+            return False
+        return (now or time.time()) - entry[1] < self.min_interval
+
+    def record(self, target, message_id, now=None):
+        self._entries[target] = (message_id, int(now or time.time()))
+        self._dirty.add(target)
+
+
+# =============================
+# Shared Target Registry
+# =============================
+def group_key(target, entity_cache=None):
+    """Key shared by every account's Target pointing at the same chat (and topic)"""
+    peer = entity_cache.peer_of(target.key) if entity_cache is not None else None
+    base = f"{peer[0]}:{peer[1]}" if peer else target.key
+    return f"{base}/{target.topic_id}" if target.topic_id else base
+
+
+class TargetRegistry:
+    """Coordinates forwards to targets that several accounts of this process share.
+
+    A shared target gets at most one forward per min_gap seconds and
+    hourly_cap per rolling hour across all accounts. A free slot goes to the
+    account asking for it, unless a less recently served account that was
+    held back is due to ask again within min_gap: then the slot is kept for
+    it. A waiter that does not ask again by its due time plus min_gap is
+    dropped. Targets listed by a single account are not limited. Each shard process
+    has its own registry, so overlaps across shards are not coordinated.
+    """
+
+    def __init__(self, min_gap=TARGET_MIN_GAP, hourly_cap=TARGET_HOURLY_CAP):
+        self.min_gap = min_gap
+        self.hourly_cap = hourly_cap
+        self.held = 0  # Forwards held back since startup
+        self._members = {}  # group -> phones listing it
+        self._groups_of = {}  # phone -> groups it lists
+        self._sent = {}  # group -> deque of (time, phone) within the last hour
+        self._served = {}  # group -> {phone: time of its last slot}
+        self._waiting = {}  # group -> {phone: time a held-back account should ask again}
+        self._delays = {}  # phone -> seconds between its loops
+
+    def register(self, phone, groups, delay=None):
+        """Set the groups an account forwards to and how often it asks"""
+        if delay is not None:
+            self._delays[phone] = delay
+        groups = set(groups)
+        old = self._groups_of.get(phone, set())
+        for group in old - groups:
+            self._leave(group, phone)
+        for group in groups - old:
+            self._members.setdefault(group, set()).add(phone)
+        self._groups_of[phone] = groups
+
+    def unregister(self, phone):
+        self._delays.pop(phone, None)
+        for group in self._groups_of.pop(phone, set()):
+            self._leave(group, phone)
+
+    def _leave(self, group, phone):
+        members = self._members.get(group)
+        if members is not None:
+            members.discard(phone)
+            if not members:
+                for table in (self._members, self._sent, self._served, self._waiting):
+                    table.pop(group, None)
+        self._waiting.get(group, {}).pop(phone, None)
+
+    def is_shared(self, group):
+        return len(self._members.get(group, ())) > 1
+
+    def shared_count(self):
+        return sum(1 for members in self._members.values() if len(members) > 1)
+
+    def acquire(self, group, phone, now=None):
+        """Reserve a forward slot; returns its time (pass to cancel) or None if held back"""
+        now = now or time.time()
+        if not self.is_shared(group):
+            return now
+        sent = self._sent.setdefault(group, deque())
+        while sent and now - sent[0][0] >= 3600:
+            sent.popleft()
+        waiting = self._waiting.setdefault(group, {})
+        members = self._members[group]
+        for other, due in list(waiting.items()):
+            if other not in members or now - due > self.min_gap:
+                del waiting[other]  # Stopped asking
+        due = now + self._delays.get(phone, self.min_gap)
+
+        if len(sent) >= self.hourly_cap or (sent and now - sent[-1][0] < self.min_gap):
+            waiting[phone] = due
+            self.held += 1
+            return None
+
+        # The slot is free. Keep it for a less recently served waiter that
+        # asks again before min_gap is over (taking it now would block that
+        # waiter's turn); otherwise the asking account gets it.
+        served = self._served.setdefault(group, {})
+        mine = served.get(phone, 0.0)
+        if any(
+            other != phone and served.get(other, 0.0) < mine and other_due < now + self.min_gap
+            for other, other_due in waiting.items()
+        ):
+            waiting[phone] = due
+            self.held += 1
+            return None
+
+        sent.append((now, phone))
+        served[phone] = now
+        waiting.pop(phone, None)
+        return now
+
+    def withdraw(self, group, phone):
+        """Stop waiting for a slot (the account cannot forward there for now)"""
+        self._waiting.get(group, {}).pop(phone, None)
+
+    def cancel(self, group, phone, reserved_at):
+        """Give back a slot whose forward did not go through"""
+        sent = self._sent.get(group)
+        if sent and (reserved_at, phone) in sent:
+            sent.remove((reserved_at, phone))
+
+    def status(self):
+        return {"shared": self.shared_count(), "held": self.held}
+
+
+# Process-wide: every AccountRunner of this process coordinates through it
+target_registry = TargetRegistry()
+
+
+# =============================
+# Fan-out Engine
+# =============================
+class Pacer:
+    """Spaces out forward starts so one account never exceeds its pacing budget"""
+
+    def __init__(self, interval):
+        self.interval = max(0.0, interval)
+        self._next_slot = 0.0
+
+    async def wait(self):
+        now = time.monotonic()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class AdaptivePacer(Pacer):
+    """Pacer whose spacing is tuned AIMD-style from the account's FloodWait history.
+
+    Every PACING_SUCCESSES_PER_STEP clean forwards shave PACING_SUCCESS_STEP
+    off the spacing; a FloodWait multiplies it by PACING_BACKOFF_FACTOR.
+    Account-wide waits also stretch the loop cadence (delay multiplier) up to
+    ADAPTIVE_CADENCE_MAX, which then relaxes by one step per clean loop.
+    """
+
+    def __init__(
+        self,
+        interval=FORWARD_PACING,
+        min_interval=PACING_MIN_INTERVAL,
+        max_interval=PACING_MAX_INTERVAL,
+        step=PACING_SUCCESS_STEP,
+        successes_per_step=PACING_SUCCESSES_PER_STEP,
+        backoff=PACING_BACKOFF_FACTOR,
+        max_cadence=ADAPTIVE_CADENCE_MAX,
+    ):
+        super().__init__(min(max(interval, min_interval), max_interval))
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.step = step
+        self.successes_per_step = successes_per_step
+        self.backoff = backoff
+        self.max_cadence = max(1.0, max_cadence)
+        self.cadence = 1.0
+        self.flood_waits = 0
+        self.flood_seconds = 0
+        self._streak = 0
+        self._flooded = False
+
+    def on_success(self):
+        self._streak += 1
+        if self._streak >= self.successes_per_step:
+            self._streak = 0
+            self.interval = max(self.min_interval, self.interval - self.step)
+
+    def on_flood(self, seconds):
+        self._streak = 0
+        self._flooded = True
+        self.flood_waits += 1
+        self.flood_seconds += seconds
+        self.interval = min(self.max_interval, max(self.interval, self.min_interval) * self.backoff)
+        if seconds >= ACCOUNT_FLOOD_WAIT_THRESHOLD:
+            self.cadence = min(self.max_cadence, self.cadence * 2)
+
+    def end_loop(self):
+        """Relax the cadence multiplier after a loop without FloodWaits"""
+        if not self._flooded:
+            self.cadence = max(1.0, self.cadence - 0.25)
+        self._flooded = False
+
+    def status(self):
+        return {
+            "interval": round(self.interval, 3),
+            "rate": round(1 / self.interval, 2) if self.interval else None,
+            "cadence": self.cadence,
+            "flood_waits": self.flood_waits,
+            "flood_seconds": self.flood_seconds,
+        }
+
+
+async def fan_out(targets, send, concurrency=1, pacing=FORWARD_PACING, precheck=None, pacer=None):
+    """Run send(i, target) for every target with at most `concurrency` in flight.
+
+    precheck(target) may return an outcome to skip a target without pacing or
+    an API call. Results are returned in target order so per-target
+    accounting is unchanged. A long-lived pacer (e.g. AdaptivePacer) replaces
+    the fixed `pacing` spacing.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    pacer = pacer if pacer is not None else Pacer(pacing)
 
-        print(f"✅ User {phone}: Worker started successfully")
+    async def run(i, target):
+        async with semaphore:
+            # Checked once a slot is free so mid-batch state changes are honoured
+            if precheck is not None:
+                outcome = precheck(target)
+                if outcome is not None:
+                    return outcome
+            await pacer.wait()
+            return await send(i, target)
+
+    return await asyncio.gather(*(run(i, target) for i, target in enumerate(targets, 1)))
+
+
+# =============================
+# Live Config Updates
+# =============================
+# Row fields a running worker can pick up without reconnecting its client
+HOT_CONFIG_FIELDS = {
+    "urls", "delay", "log_channel_id", "forward_mode", "max_concurrency",
+    "repost_interval", "content_mode", "content_count",
+}
+# Row fields that do not affect a running worker at all
+IGNORED_CONFIG_FIELDS = {"version", "updated_at", "created_at", "expiry_date"}
+
+
+class ConfigChannel:
+    """Carries field-level config diffs from the supervisor to a running worker"""
+
+    def __init__(self):
+        self.changed = asyncio.Event()
+        self._pending = {}
+
+    def send(self, diff):
+        self._pending.update(diff)
+        self.changed.set()
+
+    def receive(self):
+        diff, self._pending = self._pending, {}
+        self.changed.clear()
+        return diff
+
+
+def diff_config(old_conf, new_conf):
+    """Return {field: new_value} for every field that differs between two user rows"""
+    fields = (set(old_conf) | set(new_conf)) - IGNORED_CONFIG_FIELDS
+    return {
+        field: new_conf.get(field)
+        for field in fields
+        if old_conf.get(field) != new_conf.get(field)
+    }
+
+
+def worker_settings(user_conf):
+    """Extract the hot-reloadable worker settings from a user row"""
+    urls = json.loads(user_conf.get("urls") or "[]")
+    return {
+        "urls": urls,
+        "targets": compile_targets(urls),
+        "delay": int(user_conf.get("delay") or 5),
+        "log_channel": user_conf.get("log_channel_id") or None,
+        "forward_mode": user_conf.get("forward_mode") or "sequential",
+        "concurrency": int(user_conf.get("max_concurrency") or FORWARD_CONCURRENCY),
+        "repost_interval": int(user_conf.get("repost_interval") or 0),
+        "content_mode": user_conf.get("content_mode") or "single",
+        "content_count": min(int(user_conf.get("content_count") or 1), SAVED_WINDOW_SIZE),
+    }
+
+
+# =============================
+# Account Runner (per user)
+# =============================
+class AccountRunner:
+    """One forwarding account: its client, live settings and per-account helpers.
+
+    The scheduler connects it once through start(), then calls run_once()
+    whenever the account is due; run_once() returns the next due time, or
+    None once the account has stopped for good.
+    """
+
+    max_consecutive_errors = 5
+
+    def __init__(self, user_conf, log, stagger=False):
+        self.user_conf = dict(user_conf)
+        self.phone = user_conf["phone"]
+        self.settings = worker_settings(user_conf)
+        self.log = log
+        self.channel = ConfigChannel()
+        self.client = None
+        self.saved = None
+        self.entity_cache = EntityCache(self.phone)
+        self.flood = FloodScheduler()
+        self.health = TargetHealth(self.phone)
+        self.ledger = ForwardLedger(self.phone)
+        self.pacer = AdaptivePacer()
+        self.loop_count = 1
+        self.consecutive_errors = 0
+        self.last_run = None  # Start time of the last full loop
+        self.next_due = None  # Due time returned by the last tick
+        self.resume_at = None  # Next due time restored from a checkpoint
+        self._last_checkpoint = 0.0
+        self.memory = 0  # Approximate client footprint in bytes, sampled by memory_summary()
+        self._memory_sampled = 0.0
+        self.stagger = stagger  # Spread the first run over the delay window
+        self.connected = False
+        self.finished = False
+        self.closed = False  # Set by close(); a closed runner never ticks again
+        self.idle = asyncio.Event()
+        self.idle.set()
+
+    async def connect(self):
+        """Start the Telethon client; returns False if the account cannot run"""
+        os.makedirs("sessions", exist_ok=True)
+        self.entity_cache.load()
+        self.entity_cache.seed(await async_database.get_resolved_peers(self.phone))
+        await async_database.run(self.health.load)
+        await asyncio.to_thread(self.ledger.load, self.settings["urls"])
+        self.restore_checkpoint(await asyncio.to_thread(local_store.get_checkpoint, self.phone))
+        self.client = build_client(self.phone, self.user_conf["api_id"], self.user_conf["api_hash"])
+        await self.client.start()
         
-        loop_count = 1
-        consecutive_errors = 0
-        max_consecutive_errors = 5
+        if not await self.client.is_user_authorized():
+            print(f"❌ User {self.phone}: Not authorized, skipping...")
+            return False
 
-        while not stop_event.is_set():
-            try:
-                start = time.time()
-                success, failed = await forward_messages_enhanced(client, urls, loop_count)
-
-                summary = (
-                    f"📨 Saved Messages\n"
-                    f"👤 User: {phone}\n"
-                    f"📊 Total Targets: {len(urls)}\n"
-                    f"✅ Success: {success}\n"
-                    f"❌ Failed: {failed}\n"
-                    f"⏰ Time: {time.strftime('%H:%M:%S')}"
-                )
+        self.saved = SavedMessagesTracker(self.client)
+        await self.saved.start()
+        self.register_targets()
+        print(f"✅ User {self.phone}: Worker started successfully")
+        return True
 
-                try:
-                    await bot_logger.send_message(ADMIN_LOG_CHANNEL, summary)
-                    if user_log_channel:
-                        await bot_logger.send_message(int(user_log_channel), summary)
-                except Exception as e:
-                    print(f"⚠️ Failed to log for {phone}: {e}")
-
-                loop_count += 1
-                consecutive_errors = 0  # Reset error counter on success
-                elapsed = time.time() - start
-                wait_time = max(0, delay - elapsed)
-                
-                # Use asyncio.wait_for with timeout to handle stop_event properly
-                try:
-                    await asyncio.wait_for(stop_event.wait(), timeout=wait_time)
-                    break  # Stop event was set
-                except asyncio.TimeoutError:
-                    pass  # Timeout is normal, continue to next iteration
-
-            except (AuthKeyError, SessionPasswordNeededError) as e:
-                print(f"❌ Authentication error for {phone}: {e}")
-                try:
-                    error_summary = (
-                        f"🚨 Authentication Error\n"
-                        f"👤 User: {phone}\n"
-                        f"❌ Error: Session expired or 2FA required\n"
-                        f"⏰ Time: {time.strftime('%H:%M:%S')}"
-                    )
-                    await bot_logger.send_message(ADMIN_LOG_CHANNEL, error_summary)
-                except Exception:
-                    pass
-                break
+    async def start(self):
+        """Connect the account; returns False (and finishes it) if it cannot run"""
+        try:
+            self.connected = await self.connect()
+        except Exception as e:
+            print(f"❌ Critical error in worker for {self.phone}: {e}")
+            self.alert("Critical Worker Error", f"❌ Error: {str(e)[:100]}")
+        if not self.connected:
+            self._finish()
+        return self.connected
+
+    def restore_checkpoint(self, checkpoint):
+        """Resume loop count, pacing and deferred targets saved before a restart"""
+        if not checkpoint:
+            return
+        self.loop_count = checkpoint["loop_count"]
+        self.last_run = checkpoint["last_run"]
+        self.resume_at = checkpoint["next_due"]
+        self.flood.restore(checkpoint["deferred"], checkpoint["account_until"])
+        print(f"⏮ {self.phone}: Resumed schedule from checkpoint (loop #{self.loop_count})")
 
+    def checkpoint(self):
+        parked, account_until = self.flood.snapshot()
+        return {
+            "loop_count": self.loop_count,
+            "last_run": self.last_run,
+            "next_due": self.next_due,
+            "account_until": account_until,
+            "deferred": parked,
+            "saved_at": time.time(),
+        }
+
+    def first_run_at(self, now=None):
+        """Due time of the first loop: the checkpointed due time if it is still
+        ahead, else now, phase-shifted by a per-phone jitter when staggered"""
+        now = now or time.time()
+        if self.resume_at and self.resume_at > now:
+            return min(self.resume_at, now + self.settings["delay"])
+        if not self.stagger:
+            return now
+        phase = (zlib.crc32(self.phone.encode()) % 10000) / 10000
+        return now + phase * self.settings["delay"]
+
+    async def _persist(self, force_checkpoint=False):
+        """Save resolved peers, target health, ledger and (periodically) the schedule"""
+        self.entity_cache.save()
+        await async_database.run(self.entity_cache.sync_db)
+        await async_database.run(self.health.save)
+        await asyncio.to_thread(self.ledger.save)
+        if self.connected and (force_checkpoint or time.time() - self._last_checkpoint >= CHECKPOINT_INTERVAL):
+            await asyncio.to_thread(local_store.save_checkpoint, self.phone, self.checkpoint())
+            self._last_checkpoint = time.time()
+
+    def register_targets(self):
+        """Publish this account's target groups to the shared registry"""
+        target_registry.register(
+            self.phone,
+            {group_key(target, self.entity_cache) for target in self.settings["targets"]},
+            delay=self.loop_delay(),
+        )
+
+    async def close(self):
+        self.closed = True
+        target_registry.unregister(self.phone)
+        await self._persist(force_checkpoint=True)
+        if self.saved:
+            self.saved.stop()
+        if self.client:
+            try:
+                print(f"🔌 {self.phone}: Disconnecting client...")
+                if self.client.is_connected():
+                    await self.client.disconnect()
+                print(f"✅ {self.phone}: Client disconnected successfully")
             except Exception as e:
-                consecutive_errors += 1
-                print(f"❌ Error in worker for {phone} (attempt {consecutive_errors}/{max_consecutive_errors}): {e}")
-                
-                if consecutive_errors >= max_consecutive_errors:
-                    print(f"🛑 Too many consecutive errors for {phone}, stopping worker...")
-                    try:
-                        error_summary = (
-                            f"🚨 Worker Error Alert\n"
-                            f"👤 User: {phone}\n"
-                            f"❌ Error: Too many consecutive failures\n"
-                            f"📝 Last Error: {str(e)[:100]}\n"
-                            f"⏰ Time: {time.strftime('%H:%M:%S')}"
-                        )
-                        await bot_logger.send_message(ADMIN_LOG_CHANNEL, error_summary)
-                    except Exception:
-                        pass
-                    break
-                
-                # Exponential backoff for retries
-                wait_time = min(300, 10 * (2 ** consecutive_errors))  # Max 5 minutes
-                print(f"⏱️ {phone}: Waiting {wait_time}s before retry...")
-                
-                try:
-                    await asyncio.wait_for(stop_event.wait(), timeout=wait_time)
-                    break  # Stop event was set during wait
-                except asyncio.TimeoutError:
-                    pass  # Continue to retry
+                print(f"⚠️ {self.phone}: Failed to disconnect client: {e}")
+        self.connected = False
 
-    except Exception as e:
-        print(f"❌ Critical error in worker for {phone}: {e}")
+    def alert(self, title, error):
+        error_summary = (
+            f"🚨 {title}\n"
+            f"👤 User: {self.phone}\n"
+            f"{error}\n"
+            f"⏰ Time: {time.strftime('%H:%M:%S')}"
+        )
+        self.log.alert(ADMIN_LOG_CHANNEL, error_summary)
+
+    def _finish(self):
+        self.finished = True
+        return None
+
+    def loop_delay(self):
+        """Effective loop delay: the configured delay stretched by the adaptive cadence"""
+        return self.settings["delay"] * self.pacer.cadence
+
+    def memory_due(self):
+        return bool(self.client) and time.time() - self._memory_sampled >= CLIENT_MEMORY_SAMPLE_INTERVAL
+
+    def sample_memory(self):
+        """Re-estimate the memory held by this account's client and caches"""
+        self.memory = approx_size((self.client, self.saved, self.entity_cache))
+        self._memory_sampled = time.time()
+        return self.memory
+
+    def status(self):
+        """Current pacing and schedule of this account"""
+        status = self.pacer.status()
+        status.update(
+            phone=self.phone,
+            connected=self.connected,
+            loop_count=self.loop_count,
+            delay=self.loop_delay(),
+            next_due=self.next_due,
+            deferred=len(self.flood),
+            memory=self.memory,
+        )
+        return status
+
+    async def run_once(self):
+        if self.closed:
+            return None  # Removed after it was dispatched
+        self.idle.clear()
         try:
-            error_summary = (
-                f"🚨 Critical Worker Error\n"
-                f"👤 User: {phone}\n"
-                f"❌ Error: {str(e)[:100]}\n"
-                f"⏰ Time: {time.strftime('%H:%M:%S')}"
+            self.next_due = await self._tick()
+            return self.next_due
+        finally:
+            self.idle.set()
+
+    async def _tick(self):
+        phone = self.phone
+        if not self.connected and not await self.start():
+            return None
+
+        try:
+            if self.channel.changed.is_set():
+                diff = self.channel.receive()
+                self.user_conf.update(diff)
+                self.settings = worker_settings(self.user_conf)
+                print(f"♻️ {phone}: Applied live config change: {', '.join(sorted(diff))}")
+
+            now = time.time()
+            next_loop_at = now if self.last_run is None else self.last_run + self.loop_delay()
+            if now >= next_loop_at:
+                await self._run_loop()
+                next_loop_at = self.last_run + self.loop_delay()
+            else:
+                await self._retry_deferred()
+
+            self.consecutive_errors = 0  # Reset error counter on success
+            retry_at = self.flood.next_due()
+            return min(next_loop_at, retry_at) if retry_at else next_loop_at
+
+        except (AuthKeyError, SessionPasswordNeededError) as e:
+            print(f"❌ Authentication error for {phone}: {e}")
+            self.alert("Authentication Error", "❌ Error: Session expired or 2FA required")
+            return self._finish()
+
+        except Exception as e:
+            self.consecutive_errors += 1
+            print(
+                f"❌ Error in worker for {phone} "
+                f"(attempt {self.consecutive_errors}/{self.max_consecutive_errors}): {e}"
             )
-            await bot_logger.send_message(ADMIN_LOG_CHANNEL, error_summary)
-        except Exception:
-            pass
-    finally:
-        if client:
+            
+            if self.consecutive_errors >= self.max_consecutive_errors:
+                print(f"🛑 Too many consecutive errors for {phone}, stopping worker...")
+                self.alert(
+                    "Worker Error Alert",
+                    f"❌ Error: Too many consecutive failures\n📝 Last Error: {str(e)[:100]}",
+                )
+                return self._finish()
+            
+            # Exponential backoff for retries
+            wait_time = min(300, 10 * (2 ** self.consecutive_errors))  # Max 5 minutes
+            print(f"⏱️ {phone}: Waiting {wait_time}s before retry...")
+            return time.time() + wait_time
+
+    def _active_ledger(self):
+        """The dedup ledger, or None while re-post dedup is off (interval 0)"""
+        self.ledger.min_interval = self.settings["repost_interval"]
+        return self.ledger if self.ledger.min_interval > 0 else None
+
+    async def _run_loop(self):
+        self.last_run = time.time()
+        targets = self.settings["targets"]
+        if not targets:
+            print(f"⚠️ User {self.phone}: No URLs configured, idling...")
+            return
+        self.register_targets()
+
+        outcomes = await forward_messages_enhanced(
+            self.client, targets, self.loop_count, self.entity_cache,
+            mode=self.settings["forward_mode"], concurrency=self.settings["concurrency"],
+            flood=self.flood, saved=self.saved, health=self.health, ledger=self._active_ledger(),
+            content_mode=self.settings["content_mode"], content_count=self.settings["content_count"],
+            pacer=self.pacer, registry=target_registry, account=self.phone,
+        )
+        self.pacer.end_loop()
+        await self._persist()
+        self.loop_count += 1
+
+        # Buffered into periodic digests; never waits on the Bot API
+        self.log.submit(ADMIN_LOG_CHANNEL, self.phone, outcomes, len(targets))
+        self.log.submit(self.settings["log_channel"], self.phone, outcomes, len(targets))
+
+    async def _retry_deferred(self):
+        by_url = {target.url: target for target in self.settings["targets"]}
+        due_targets = [by_url[url] for url in self.flood.pop_due() if url in by_url]
+        if not due_targets:
+            return
+        print(f"🔁 {self.phone}: Retrying {len(due_targets)} deferred target(s)...")
+        retried = await forward_messages_enhanced(
+            self.client, due_targets, self.loop_count, self.entity_cache,
+            mode=self.settings["forward_mode"], concurrency=self.settings["concurrency"],
+            flood=self.flood, saved=self.saved, health=self.health, ledger=self._active_ledger(),
+            content_mode=self.settings["content_mode"], content_count=self.settings["content_count"],
+            pacer=self.pacer, registry=target_registry, account=self.phone, reuse_batch=True,
+        )
+        await self._persist()
+        print(
+            f"🔁 {self.phone}: Retry done - ✅ {retried[OUTCOME_SUCCESS]} "
+            f"❌ {retried[OUTCOME_FAILED]} ⏳ {retried[OUTCOME_DEFERRED]}"
+        )
+
+
+# =============================
+# Scheduler
+# =============================
+class ForwardScheduler:
+    """Single timer heap of (next_due, account) driving every account.
+
+    Due accounts are handed to a bounded pool of coroutines, so cost scales
+    with the number of accounts that are actually due rather than with the
+    total. Re-keying pushes a new heap entry and lazily invalidates the old one.
+    New accounts first pass through a warm-up pipeline that connects at most
+    connect_concurrency clients at a time.
+    """
+
+    def __init__(self, pool_size=SCHEDULER_POOL_SIZE, connect_concurrency=STARTUP_CONNECT_CONCURRENCY):
+        self.pool_size = pool_size
+        self.connect_concurrency = connect_concurrency
+        self._accounts = {}  # phone -> AccountRunner
+        self._heap = []  # (due, seq, phone)
+        self._current = {}  # phone -> seq of its live heap entry
+        self._requested = {}  # phone -> due asked for while the account was running
+        self._in_flight = set()
+        self._connecting = set()  # Accounts whose client.start() is in flight
+        self._seq = 0
+        self._ready = asyncio.Queue()
+        self._connect_queue = asyncio.Queue()
+        self._wakeup = asyncio.Event()
+        self._tasks = []
+        self.warmup = {"total": 0, "connected": 0, "failed": 0}
+
+    def __len__(self):
+        return len(self._accounts)
+
+    def get(self, phone):
+        return self._accounts.get(phone)
+
+    def items(self):
+        return list(self._accounts.items())
+
+    def add(self, account, due=None):
+        self._accounts[account.phone] = account
+        if not account.connected:
+            # Connect through the warm-up pipeline; it schedules the first run
+            self._in_flight.add(account)
+            self.warmup["total"] += 1
+            self._connect_queue.put_nowait(account)
+            return
+        self.schedule(account.phone, time.time() if due is None else due)
+
+    def schedule(self, phone, due):
+        """(Re-)key an account to run at `due`"""
+        account = self._accounts.get(phone)
+        if account is None:
+            return
+        if account in self._in_flight:
+            # Applied once the running tick returns
+            self._requested[phone] = min(due, self._requested.get(phone, due))
+            return
+        self._seq += 1
+        self._current[phone] = self._seq
+        heapq.heappush(self._heap, (due, self._seq, phone))
+        if self._heap[0][1] == self._seq:
+            self._wakeup.set()
+
+    def wake(self, phone):
+        self.schedule(phone, time.time())
+
+    async def remove(self, phone, timeout=5.0):
+        """Cancel an account's schedule, let a running tick finish, then disconnect it.
+
+        Covers every state an account can be in: queued or in flight in the
+        warm-up pipeline, dispatched to the pool, or running a tick.
+        """
+        account = self._accounts.pop(phone, None)
+        self._current.pop(phone, None)
+        self._requested.pop(phone, None)
+        if account is None:
+            return
+        if account in self._connecting:
+            # The connect worker disconnects it as soon as its start() returns
+            try:
+                await asyncio.wait_for(account.idle.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                print(f"⚠️ {phone}: Still connecting, it is disconnected once connected")
+            return
+        if account in self._in_flight and account.idle.is_set():
+            # Connected and dispatched but not picked up yet: pool workers skip
+            # removed accounts and run_once() refuses a closed runner
+            self._in_flight.discard(account)
+        elif not account.idle.is_set():
+            try:
+                await asyncio.wait_for(account.idle.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                print(f"⚠️ {phone}: Still forwarding, disconnecting anyway...")
+        await account.close()
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._dispatch())]
+        self._tasks += [asyncio.create_task(self._pool_worker()) for _ in range(self.pool_size)]
+        self._tasks += [asyncio.create_task(self._connect_worker()) for _ in range(self.connect_concurrency)]
+
+    async def stop(self, timeout=10.0):
+        dispatcher, pool = self._tasks[0], self._tasks[1:]
+        dispatcher.cancel()
+        running = [account.idle.wait() for account in self._in_flight]
+        if running:
+            print("⏱️ Waiting for workers to finish...")
+            try:
+                await asyncio.wait_for(asyncio.gather(*running), timeout=timeout)
+            except asyncio.TimeoutError:
+                print("⚠️ Some workers didn't stop gracefully, cancelling...")
+        for task in pool:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        for phone in list(self._accounts):
+            print(f"🛑 Stopping {phone}...")
+            await self.remove(phone, timeout=0)
+
+    async def _dispatch(self):
+        while True:
+            self._wakeup.clear()
+            now = time.time()
+            while self._heap and self._heap[0][0] <= now:
+                _, seq, phone = heapq.heappop(self._heap)
+                if self._current.get(phone) != seq:
+                    continue  # Cancelled or re-keyed
+                del self._current[phone]
+                account = self._accounts[phone]
+                self._in_flight.add(account)
+                self._ready.put_nowait(account)
+
+            timeout = self._heap[0][0] - now if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _connect_worker(self):
+        while True:
+            account = await self._connect_queue.get()
+            if self._accounts.get(account.phone) is not account:
+                self._in_flight.discard(account)
+                self.warmup["total"] -= 1  # Removed before it was connected
+                self._report_warmup()
+                continue
+
+            account.idle.clear()
+            self._connecting.add(account)
+            try:
+                connected = await account.start()
+                if self._accounts.get(account.phone) is not account:
+                    await account.close()  # Removed while connecting
+            finally:
+                self._connecting.discard(account)
+                account.idle.set()
+                self._in_flight.discard(account)
+                self._requested.pop(account.phone, None)  # The first run picks up any config change
+
+            self.warmup["connected" if connected else "failed"] += 1
+            if connected and self._accounts.get(account.phone) is account:
+                self.schedule(account.phone, account.first_run_at())
+            self._report_warmup()
+
+    def _report_warmup(self):
+        warmup = self.warmup
+        done = warmup["connected"] + warmup["failed"]
+        if done < warmup["total"]:
+            step = max(1, warmup["total"] // 10)
+            if warmup["total"] > 1 and done and done % step == 0:
+                print(f"🔌 Warm-up: {done}/{warmup['total']} clients ({warmup['failed']} failed)")
+            return
+        # A single account (re)connecting on its own is not a warm-up batch
+        if warmup["total"] > 1:
+            print(f"✅ Warm-up complete: {warmup['connected']} connected, {warmup['failed']} failed")
+        self.warmup = {"total": 0, "connected": 0, "failed": 0}
+
+    async def _pool_worker(self):
+        while True:
+            account = await self._ready.get()
+            if self._accounts.get(account.phone) is not account:
+                self._in_flight.discard(account)  # Removed after it was dispatched
+                continue
+            next_due = None
             try:
-                print(f"🔌 {phone}: Disconnecting client...")
-                if client.is_connected():
-                    await client.disconnect()
-                print(f"✅ {phone}: Client disconnected successfully")
+                next_due = await account.run_once()
             except Exception as e:
-                print(f"⚠️ {phone}: Failed to disconnect client: {e}")
+                print(f"❌ Unhandled error in worker for {account.phone}: {e}")
+            finally:
+                self._in_flight.discard(account)
+                requested = self._requested.pop(account.phone, None)
+                if self._accounts.get(account.phone) is account and next_due is not None:
+                    self.schedule(account.phone, min(next_due, requested or next_due))
 
 
 # =============================
 # Supervisor
 # =============================
-_running_tasks = {}
-_stop_events = {}
+_scheduler = None
 _user_configs = {}
+_row_versions = {}  # user id -> last seen users.version
+_sync_watermark = None  # users.updated_at the next reconcile reads from
 _stop_main = asyncio.Event()
-_bot_logger = None
+_log_dispatcher = None
+_shard = None  # (index, count) when running inside a shard process
+_resharded = False
+_handoff = None  # Shard count this shard released its lost accounts for, until resized
+_shard_host = None
+
+
+def configure_shard(index, count):
+    """Restrict this process' supervisor to the accounts of one shard"""
+    global _shard, _resharded, _handoff
+    if _shard is not None and _shard[1] != count:
+        _resharded = True
+    _shard = (index, count)
+    _handoff = None
+
+
+def owns_phone(phone):
+    if _shard is None:
+        return True
+    index, count = _shard
+    # During a handoff only accounts kept under both counts are owned
+    return shard_of(phone, count) == index and (_handoff is None or shard_of(phone, _handoff) == index)
+
+
+async def release_shard(count):
+    """Stop the accounts this shard loses at `count` shards, before their new owner starts them"""
+    global _handoff
+    _handoff = count
+    if _scheduler is None:
+        return
+    for phone, _ in _scheduler.items():
+        if not owns_phone(phone):
+            await _stop_worker(phone, "Handing off")
+            _user_configs.pop(phone, None)
+
+
+def get_status():
+    """Snapshot of the accounts driven by this process"""
+    accounts = _scheduler.items() if _scheduler else []
+    return {
+        "accounts": len(accounts),
+        "in_flight": sum(1 for _, account in accounts if not account.idle.is_set()),
+        "finished": sorted(phone for phone, account in accounts if account.finished),
+        "warmup": dict(_scheduler.warmup) if _scheduler else {},
+        "pacing": pacing_summary(account for _, account in accounts),
+        "memory": memory_summary(account for _, account in accounts),
+        "coordination": target_registry.status(),
+    }
+
+
+def memory_summary(accounts, samples=CLIENT_MEMORY_SAMPLES_PER_STATUS):
+    """Process RSS and the approximate per-client footprint of connected accounts.
+
+    Estimates are walks of the object graph on the event loop, so each call
+    refreshes at most `samples` of the stalest ones; the rest reuse their
+    last estimate. Accounts not sampled yet are left out of the average.
+    """
+    connected = [account for account in accounts if account.connected]
+    due = sorted((account for account in connected if account.memory_due()), key=lambda a: a._memory_sampled)
+    for account in due[:samples]:
+        account.sample_memory()
+    footprints = [account.memory for account in connected if account.memory]
+    return {
+        "rss": process_rss(),
+        "clients": len(footprints),
+        "client_total": sum(footprints),
+        "client_avg": sum(footprints) // len(footprints) if footprints else 0,
+    }
+
+
+def pacing_summary(accounts, slowest=5):
+    """Aggregate adaptive pacing over accounts: spacing range and the most throttled ones"""
+    statuses = [account.status() for account in accounts if account.connected]
+    if not statuses:
+        return {}
+    intervals = [status["interval"] for status in statuses]
+    throttled = sorted(statuses, key=lambda status: status["interval"], reverse=True)[:slowest]
+    return {
+        "min_interval": min(intervals),
+        "avg_interval": round(sum(intervals) / len(intervals), 3),
+        "max_interval": max(intervals),
+        "slow_cadence": sum(1 for status in statuses if status["cadence"] > 1),
+        "slowest": [
+            {key: status[key] for key in ("phone", "interval", "cadence", "flood_waits")}
+            for status in throttled
+        ],
+    }
+
+
+def get_account_status(phone):
+    """Pacing/schedule status of one account driven by this process, or None"""
+    account = _scheduler.get(phone) if _scheduler else None
+    return account.status() if account else None
+
+
+async def _stop_worker(phone, reason="Stopping"):
+    """Unschedule an account and disconnect its client"""
+    if _scheduler is None or _scheduler.get(phone) is None:
+        return
+    print(f"🛑 {reason} worker for {phone}")
+    try:
+        await _scheduler.remove(phone)
+    except Exception as e:
+        print(f"⚠️ Error stopping worker for {phone}: {e}")
+
+
+def _try_hot_update(user_conf):
+    """Push a config diff to a running account; False if a restart/stop is needed"""
+    phone = user_conf["phone"]
+    account = _scheduler.get(phone)
+    if account is None or account.finished or phone not in _user_configs:
+        return False
+    if not user_conf.get("auto_forwarding"):
+        return False
+
+    diff = diff_config(_user_configs[phone], user_conf)
+    if not set(diff) <= HOT_CONFIG_FIELDS:
+        return False  # api_id/api_hash/phone changes need a fresh client
+
+    _user_configs[phone] = user_conf.copy()
+    if diff:
+        account.channel.send(diff)
+        _scheduler.wake(phone)
+        print(f"♻️ Hot-updated worker for {phone}: {', '.join(sorted(diff))}")
+    return True
+
+
+def _start_worker(user_conf, stagger=False):
+    """Register an account with the scheduler if forwarding is enabled"""
+    phone = user_conf["phone"]
+    if not user_conf.get("auto_forwarding") or not owns_phone(phone):
+        _user_configs.pop(phone, None)
+        return
+    _user_configs[phone] = user_conf.copy()
+    if not worker_settings(user_conf)["urls"]:
+        print(f"⚠️ User {phone}: No URLs configured. Worker stopped.")
+        return
+    _scheduler.add(AccountRunner(user_conf, _log_dispatcher, stagger=stagger))
+    print(f"✅ Started worker for {phone}")
 
 
 async def supervisor():
-    global _running_tasks, _stop_events, _user_configs, _bot_logger
+    global _scheduler, _user_configs, _log_dispatcher, _sync_watermark, _resharded
     
-    # Initialize bot logger
-    _bot_logger = Bot(token=BOT_TOKEN)
+    # Initialize the log digest dispatcher and the shared scheduler
+    _log_dispatcher = LogDispatcher(Bot(token=BOT_TOKEN))
+    _log_dispatcher.start()
+    _scheduler = ForwardScheduler()
+    _scheduler.start()
     
     consecutive_errors = 0
     max_consecutive_errors = 10
+    last_full_scan = 0.0
     
     while not _stop_main.is_set():
         try:
-            db_users = database.get_all_users(offset=0, limit=1000)
-            current_phones = {u[1] for u in db_users}
+            if _resharded:
+                # Drop accounts this shard no longer owns and re-read every row for new ones
+                _resharded = False
+                last_full_scan = 0.0
+                _sync_watermark = None
+                _row_versions.clear()
+                print(f"🧩 Shard {_shard[0]}: Rebalancing for {_shard[1]} shards...")
 
-            # Stop removed users
-            for phone in list(_running_tasks.keys()):
-                if phone not in current_phones:
-                    print(f"🛑 Stopping worker for {phone}")
-                    try:
-                        _stop_events[phone].set()
-                        # Wait a bit for graceful shutdown
-                        try:
-                            await asyncio.wait_for(_running_tasks[phone], timeout=5.0)
-                        except asyncio.TimeoutError:
-                            _running_tasks[phone].cancel()
-                    except Exception as e:
-                        print(f"⚠️ Error stopping worker for {phone}: {e}")
-                    finally:
-                        _running_tasks.pop(phone, None)
-                        _stop_events.pop(phone, None)
+            # Stop removed users (full keyset scan of ids, only phones kept in memory)
+            if time.time() - last_full_scan >= SUPERVISOR_FULL_SCAN_INTERVAL:
+                current_phones = set()
+                async for batch in async_database.iter_user_phones(SUPERVISOR_BATCH_SIZE):
+                    current_phones.update(phone for _, phone in batch if owns_phone(phone))
+                last_full_scan = time.time()
+
+                for phone, _ in _scheduler.items():
+                    if phone not in current_phones:
+                        await _stop_worker(phone)
                         _user_configs.pop(phone, None)
 
-            # Start/restart users
-            for row in db_users:
-                try:
-                    uid, phone, api_id = row
-                    user_conf = database.get_user_by_id(uid)
-                    if not user_conf:
+            # Only rows whose version moved since the last reconcile need work
+            newest = None
+            initial_sync = _sync_watermark is None  # Startup: stagger first runs
+            async for changed_rows in async_database.iter_users_changed_since(_sync_watermark, SUPERVISOR_BATCH_SIZE):
+                for user_conf in changed_rows:
+                    phone = user_conf.get("phone")
+                    if not owns_phone(phone):
+                        continue
+                    try:
+                        uid = user_conf["id"]
+                        if _row_versions.get(uid) == user_conf.get("version"):
+                            continue  # Seen already (overlap window)
+                        _row_versions[uid] = user_conf.get("version")
+
+                        if _try_hot_update(user_conf):
+                            continue
+
+                        await _stop_worker(phone, "Restarting")
+                        _start_worker(user_conf, stagger=initial_sync)
+
+                    except Exception as e:
+                        print(f"⚠️ Error processing user {phone}: {e}")
                         continue
+                newest = changed_rows[-1]["updated_at"]
+
+            if newest is not None:
+                # Re-read a small window so rows committed out of order are not missed
+                _sync_watermark = newest - timedelta(seconds=SYNC_OVERLAP_SECONDS)
 
-                    # Check if user config changed or worker doesn't exist
-                    config_changed = user_conf != _user_configs.get(phone)
-                    worker_missing = phone not in _running_tasks
-                    worker_done = phone in _running_tasks and _running_tasks[phone].done()
-
-                    if config_changed or worker_missing or worker_done:
-                        # Stop existing worker if it exists
-                        if phone in _running_tasks:
-                            print(f"🔄 Restarting worker for {phone}")
-                            try:
-                                _stop_events[phone].set()
-                                try:
-                                    await asyncio.wait_for(_running_tasks[phone], timeout=5.0)
-                                except asyncio.TimeoutError:
-                                    _running_tasks[phone].cancel()
-                            except Exception as e:
-                                print(f"⚠️ Error restarting worker for {phone}: {e}")
-                            finally:
-                                _running_tasks.pop(phone, None)
-                                _stop_events.pop(phone, None)
-
-                        # Start new worker
-                        if user_conf.get("auto_forwarding"):
-                            stop_event = asyncio.Event()
-                            task = asyncio.create_task(user_worker(user_conf, _bot_logger, stop_event))
-                            _running_tasks[phone] = task
-                            _stop_events[phone] = stop_event
-                            _user_configs[phone] = user_conf.copy()
-                            print(f"✅ Started worker for {phone}")
-
-                except Exception as e:
-                    print(f"⚠️ Error processing user {phone}: {e}")
-                    continue
+            # Restart accounts that stopped on their own
+            for phone, account in _scheduler.items():
+                if account.finished and phone in _user_configs:
+                    await _stop_worker(phone, "Restarting")
+                    _start_worker(_user_configs[phone])
 
             consecutive_errors = 0  # Reset error counter on successful iteration
 
@@ -404,31 +1718,8 @@ async def supervisor():
             pass  # Normal timeout, continue loop
 
     print("🛑 Supervisor stopping workers...")
-    
-    # Stop all workers gracefully
-    for phone, stop_event in list(_stop_events.items()):
-        try:
-            print(f"🛑 Stopping {phone}...")
-            stop_event.set()
-        except Exception as e:
-            print(f"⚠️ Error setting stop event for {phone}: {e}")
-    
-    # Wait for workers to finish
-    if _running_tasks:
-        print("⏱️ Waiting for workers to finish...")
-        try:
-            await asyncio.wait_for(
-                asyncio.gather(*_running_tasks.values(), return_exceptions=True),
-                timeout=10.0
-            )
-        except asyncio.TimeoutError:
-            print("⚠️ Some workers didn't stop gracefully, cancelling...")
-            for phone, task in _running_tasks.items():
-                try:
-                    task.cancel()
-                except Exception as e:
-                    print(f"⚠️ Error cancelling task for {phone}: {e}")
-    
+    await _scheduler.stop()
+    await _log_dispatcher.stop()
     print("✅ All workers stopped.")
 
 
@@ -436,8 +1727,15 @@ async def supervisor():
 # Public API for main.py
 # =============================
 async def run_forwarders():
+    global _shard_host
     try:
-        database.init_db()
+        await async_database.init_db()
+        if FORWARDER_SHARDS > 0:
+            print(f"🚀 Starting {FORWARDER_SHARDS} forwarder shard processes...")
+            _shard_host = ShardHost(FORWARDER_SHARDS)
+            _shard_host.start()
+            print("✅ Forwarder shards started")
+            return
         print("🚀 Starting forwarder supervisor...")
         asyncio.create_task(supervisor())
         print("✅ Forwarder supervisor started")
@@ -449,6 +1747,9 @@ async def run_forwarders():
 async def stop_forwarders():
     try:
         print("🛑 Stopping forwarders...")
+        if _shard_host:
+            await _shard_host.stop()
+            return
         _stop_main.set()
         
         # Wait a bit for graceful shutdown
@@ -457,4 +1758,21 @@ async def stop_forwarders():
     except Exception as e:
         print(f"❌ Error stopping forwarders: {e}")
     finally:
-        print("✅ Forwarder stop sequence completed")
\ No newline at end of file
+        print("✅ Forwarder stop sequence completed")
+
+
+def get_forwarder_status():
+    """Forwarder status for the admin bot (aggregated over shards when sharded)"""
+    if _shard_host:
+        return _shard_host.get_status()
+    status = get_status()
+    status.update(shards=0, per_shard=[])
+    return status
+
+
+def resize_forwarders(count):
+    """Change the number of shard processes; False when not running sharded"""
+    if not _shard_host:
+        return False
+    _shard_host.resize(count)
+    return True
@@ -0,0 +1,155 @@
+# ================== LOCAL_STORE.PY ==================
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from config import LOCAL_STORE_PATH
+
+# One SQLite file per host for high-volume forwarder state that does not
+# belong in MySQL: dedup ledger and schedule checkpoints (WAL mode lets
+# shard processes share it)
+_local_lock = threading.Lock()
+_local_conn = None
+
+
+def get_local_connection():
+    """Get this process' SQLite connection, creating the schema on first use"""
+    global _local_conn
+    if _local_conn is None:
+        os.makedirs(os.path.dirname(LOCAL_STORE_PATH) or ".", exist_ok=True)
+        conn = sqlite3.connect(LOCAL_STORE_PATH, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS forward_ledger (
+                phone TEXT NOT NULL,
+                target TEXT NOT NULL,
+                message_id INTEGER NOT NULL,
+                sent_at INTEGER NOT NULL,
+                PRIMARY KEY (phone, target)
+            ) WITHOUT ROWID
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS account_checkpoint (
+                phone TEXT PRIMARY KEY,
+                loop_count INTEGER NOT NULL,
+                last_run REAL,
+                next_due REAL,
+                account_until REAL NOT NULL DEFAULT 0,
+                deferred TEXT NOT NULL DEFAULT '{}',
+                saved_at REAL NOT NULL
+            )
+        """)
+        conn.commit()
+        _local_conn = conn
+    return _local_conn
+
+
+@contextmanager
+def get_local_cursor():
+    """Context manager for local store operations (commits on success)"""
+    with _local_lock:
+        conn = get_local_connection()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+
+# =============================
+# Forward Ledger
+# =============================
+def get_ledger(phone):
+    """Get {target: (message_id, sent_at)} for one account"""
+    try:
+        with get_local_cursor() as conn:
+            rows = conn.execute(
+                "SELECT target, message_id, sent_at FROM forward_ledger WHERE phone = ?", (phone,)
+            ).fetchall()
+        return {target: (message_id, sent_at) for target, message_id, sent_at in rows}
+    except Exception as e:
+        print(f"❌ Local store error in get_ledger: {e}")
+        return {}
+
+
+def save_ledger(phone, entries):
+    """Upsert (target, message_id, sent_at) entries for one account"""
+    try:
+        with get_local_cursor() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO forward_ledger (phone, target, message_id, sent_at) VALUES (?, ?, ?, ?)",
+                [(phone, *entry) for entry in entries],
+            )
+        return True
+    except Exception as e:
+        print(f"❌ Local store error in save_ledger: {e}")
+        return False
+
+
+def prune_ledger(phone, targets):
+    """Drop ledger rows of targets the account no longer forwards to"""
+    try:
+        with get_local_cursor() as conn:
+            stored = [row[0] for row in conn.execute(
+                "SELECT target FROM forward_ledger WHERE phone = ?", (phone,)
+            )]
+            stale = [(phone, target) for target in stored if target not in targets]
+            conn.executemany("DELETE FROM forward_ledger WHERE phone = ? AND target = ?", stale)
+        return len(stale)
+    except Exception as e:
+        print(f"❌ Local store error in prune_ledger: {e}")
+        return 0
+
+
+# =============================
+# Schedule Checkpoints
+# =============================
+def get_checkpoint(phone):
+    """Get the last saved schedule of an account, or None"""
+    try:
+        with get_local_cursor() as conn:
+            row = conn.execute(
+                "SELECT loop_count, last_run, next_due, account_until, deferred, saved_at "
+                "FROM account_checkpoint WHERE phone = ?", (phone,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "loop_count": row[0],
+            "last_run": row[1],
+            "next_due": row[2],
+            "account_until": row[3],
+            "deferred": json.loads(row[4]),
+            "saved_at": row[5],
+        }
+    except Exception as e:
+        print(f"❌ Local store error in get_checkpoint: {e}")
+        return None
+
+
+def save_checkpoint(phone, checkpoint):
+    """Store an account's schedule (loop count, last run, next due, deferred targets)"""
+    try:
+        with get_local_cursor() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO account_checkpoint "
+                "(phone, loop_count, last_run, next_due, account_until, deferred, saved_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    phone,
+                    checkpoint["loop_count"],
+                    checkpoint["last_run"],
+                    checkpoint["next_due"],
+                    checkpoint["account_until"],
+                    json.dumps(checkpoint["deferred"]),
+                    checkpoint["saved_at"],
+                ),
+            )
+        return True
+    except Exception as e:
+        print(f"❌ Local store error in save_checkpoint: {e}")
+        return False
@@ -0,0 +1,189 @@
+# ================== LOG_DISPATCHER.PY ==================
+import asyncio
+import time
+from collections import Counter, OrderedDict
+from datetime import timedelta
+
+from telegram.error import RetryAfter
+
+from config import (
+    LOG_DIGEST_INTERVAL,
+    LOG_QUEUE_SIZE,
+    LOG_CHANNEL_SEND_INTERVAL,
+    LOG_GLOBAL_SEND_INTERVAL,
+)
+
+MAX_MESSAGE_LENGTH = 4000  # Bot API limit is 4096, keep some headroom
+
+
+class LogDispatcher:
+    """Collects forwarding reports and sends them as periodic per-channel digests.
+
+    submit()/alert() never block: reports for the same account are merged and,
+    once the buffer is full, new entries are counted as dropped instead.
+    """
+
+    def __init__(
+        self,
+        bot,
+        interval=LOG_DIGEST_INTERVAL,
+        max_entries=LOG_QUEUE_SIZE,
+        channel_interval=LOG_CHANNEL_SEND_INTERVAL,
+        global_interval=LOG_GLOBAL_SEND_INTERVAL,
+    ):
+        self.bot = bot
+        self.interval = interval
+        self.max_entries = max_entries
+        self.channel_interval = channel_interval
+        self.global_interval = global_interval
+        self.sent = 0
+        self.dropped = 0
+        self._summaries = {}  # channel -> OrderedDict(phone -> merged report)
+        self._alerts = {}  # channel -> OrderedDict(text -> repeat count)
+        self._dropped = Counter()  # channel -> entries dropped since the last digest
+        self._size = 0  # Buffered reports
+        self._alert_size = 0  # Buffered alerts, bounded separately so reports cannot crowd them out
+        self._since = time.time()
+        self._last_send = {}  # channel -> monotonic time of the last message
+        self._last_global = 0.0
+        self._urgent = asyncio.Event()
+        self._task = None
+
+    def __len__(self):
+        return self._size + self._alert_size
+
+    def _drop(self, channel):
+        self._dropped[channel] += 1
+        self.dropped += 1
+
+    def submit(self, channel, phone, outcomes, total):
+        """Queue one loop report; merged with earlier reports of the same account"""
+        if not channel:
+            return
+        reports = self._summaries.setdefault(channel, OrderedDict())
+        report = reports.get(phone)
+        if report is None:
+            if self._size >= self.max_entries:
+                self._drop(channel)
+                return
+            self._size += 1
+            report = reports[phone] = {"loops": 0, "total": 0, "outcomes": Counter()}
+        report["loops"] += 1
+        report["total"] = total
+        report["outcomes"].update(outcomes)
+
+    def alert(self, channel, text):
+        """Queue an alert; flushed ahead of the next digest, duplicates are merged"""
+        if not channel:
+            return
+        alerts = self._alerts.setdefault(channel, OrderedDict())
+        if text in alerts:
+            alerts[text] += 1
+        elif self._alert_size < self.max_entries:
+            self._alert_size += 1
+            alerts[text] = 1
+        else:
+            self._drop(channel)
+        self._urgent.set()
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the periodic flush and send whatever is still buffered"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        # The digest is due at a fixed deadline; alerts flush in between
+        # without postponing it
+        while True:
+            deadline = self._since + self.interval
+            try:
+                remaining = deadline - time.time()
+                if remaining > 0:
+                    try:
+                        await asyncio.wait_for(self._urgent.wait(), timeout=remaining)
+                    except asyncio.TimeoutError:
+                        pass
+                if self._urgent.is_set():
+                    self._urgent.clear()
+                    await self.flush(alerts_only=True)
+                if time.time() >= deadline:
+                    await self.flush()
+            except Exception as e:
+                print(f"⚠️ Log dispatcher flush failed: {e}")
+                if time.time() >= deadline:
+                    self._since = time.time()  # Retry at the next interval, not in a tight loop
+
+    async def flush(self, alerts_only=False):
+        """Send buffered alerts (and digests unless alerts_only) to every channel"""
+        alerts, self._alerts = self._alerts, {}
+        self._alert_size -= sum(len(entries) for entries in alerts.values())
+        for channel, entries in alerts.items():
+            lines = [text if count == 1 else f"{text}\n🔁 Repeated {count}x" for text, count in entries.items()]
+            await self._send_chunks(channel, lines, separator="\n\n")
+
+        if alerts_only:
+            return
+
+        summaries, self._summaries = self._summaries, {}
+        dropped, self._dropped = self._dropped, Counter()
+        self._size -= sum(len(reports) for reports in summaries.values())
+        since, self._since = self._since, time.time()
+
+        for channel in set(summaries) | set(dropped):
+            lines = [
+                f"📨 Forwarding Digest "
+                f"({time.strftime('%H:%M:%S', time.localtime(since))} - {time.strftime('%H:%M:%S')})"
+            ]
+            for phone, report in summaries.get(channel, {}).items():
+                outcomes = report["outcomes"]
+                lines.append(
+                    f"👤 {phone}: {report['loops']} loop(s) • {report['total']} targets • "
+                    f"✅ {outcomes['success']} ❌ {outcomes['failed']} ⏳ {outcomes['deferred']} "
+                    f"🚫 {outcomes['quarantined']} ⏭ {outcomes['skipped']}"
+                )
+            if dropped[channel]:
+                lines.append(f"⚠️ {dropped[channel]} report(s) dropped (log buffer full)")
+            await self._send_chunks(channel, lines)
+
+    async def _send_chunks(self, channel, lines, separator="\n"):
+        chunk = ""
+        for line in lines:
+            if chunk and len(chunk) + len(separator) + len(line) > MAX_MESSAGE_LENGTH:
+                await self._send(channel, chunk)
+                chunk = ""
+            chunk = f"{chunk}{separator}{line}" if chunk else line[:MAX_MESSAGE_LENGTH]
+        if chunk:
+            await self._send(channel, chunk)
+
+    async def _send(self, channel, text):
+        # Stay under the Bot API limits: per chat and across all chats
+        now = time.monotonic()
+        wait = max(
+            self._last_send.get(channel, 0.0) + self.channel_interval - now,
+            self._last_global + self.global_interval - now,
+        )
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+        for attempt in range(2):
+            self._last_global = self._last_send[channel] = time.monotonic()
+            try:
+                await self.bot.send_message(int(channel), text)
+                self.sent += 1
+                return
+            except RetryAfter as e:
+                retry_after = e.retry_after
+                if isinstance(retry_after, timedelta):
+                    retry_after = retry_after.total_seconds()
+                print(f"⏳ Log channel {channel} rate limited, retrying in {retry_after}s...")
+                await asyncio.sleep(retry_after)
+            except Exception as e:
+                print(f"⚠️ Failed to send log to {channel}: {e}")
+                return
+        print(f"⚠️ Dropped log message for {channel} after rate limiting")
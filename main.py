@@ -14,10 +14,10 @@ import authorised
 import update_urls
 import user_manage
 import add_log_channel
-from database import init_db
+from database import init_db, get_pool_stats, close_pool, get_user_cache_stats
 
 import asyncio
-from forwarder import run_forwarders, stop_forwarders
+from forwarder import run_forwarders, stop_forwarders, get_forwarder_status, resize_forwarders
 
 
 # ================== AUTH CHECK ==================
@@ -75,6 +75,89 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
             pass
 
 
+# ================== FORWARDER STATUS ==================
+async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    try:
+        if not update.effective_user or not is_authorized(update.effective_user.id):
+            await update.message.reply_text("⛔ You are not authorized to use this bot.")
+            return
+
+        status = get_forwarder_status()
+        lines = [
+            "📊 Forwarder Status",
+            f"🧩 Shards: {status['shards'] or 'in-process'}",
+            f"👥 Accounts: {status['accounts']}",
+            f"⚡ Forwarding now: {status['in_flight']}",
+        ]
+        pacing = status.get("pacing") or {}
+        if pacing:
+            lines.append(
+                f"🐢 Pacing: {pacing['min_interval']}s / {pacing['avg_interval']}s / "
+                f"{pacing['max_interval']}s (min/avg/max), {pacing['slow_cadence']} slowed down"
+            )
+            for account in pacing["slowest"]:
+                lines.append(
+                    f"  • {account['phone']}: {account['interval']}s spacing, "
+                    f"x{account['cadence']} delay, {account['flood_waits']} flood waits"
+                )
+        coordination = status.get("coordination") or {}
+        if coordination.get("shared"):
+            lines.append(
+                f"🤝 Shared targets: {coordination['shared']}, "
+                f"{coordination['held']} forward(s) held back for spacing"
+            )
+        memory = status.get("memory") or {}
+        if memory:
+            lines.append(
+                f"🧠 Memory: {memory['rss'] / 2**20:.0f} MB RSS, "
+                f"~{memory['client_avg'] / 2**10:.0f} KB per client ({memory['clients']} clients)"
+            )
+        pool = get_pool_stats()
+        lines.append(
+            f"🗄 DB pool: {pool['in_use']}/{pool['size']} in use, {pool['idle']} idle, "
+            f"{pool['overflows']} overflow, {pool['timeouts']} timed out, avg wait {pool['avg_wait_ms']} ms"
+        )
+        cache = get_user_cache_stats()
+        lines.append(
+            f"🗃 User cache: {cache['size']} rows, {cache['hits']} hits / {cache['misses']} misses "
+            f"({cache['hit_rate']:.0%}), {cache['invalidations']} invalidations"
+        )
+        for index, report in enumerate(status["per_shard"]):
+            if report is None:
+                lines.append(f"• Shard {index}: ⏳ no report yet")
+            else:
+                lines.append(
+                    f"• Shard {index}: {report['accounts']} accounts, "
+                    f"{report['in_flight']} active, "
+                    f"{(report.get('memory') or {}).get('rss', 0) / 2**20:.0f} MB (pid {report['pid']})"
+                )
+        await update.message.reply_text("\n".join(lines))
+    except Exception as e:
+        print(f"❌ Status command error: {e}")
+
+
+async def shards_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    try:
+        if not update.effective_user or not is_authorized(update.effective_user.id):
+            await update.message.reply_text("⛔ You are not authorized to use this bot.")
+            return
+
+        try:
+            count = int(context.args[0])
+            if count < 1:
+                raise ValueError
+        except (IndexError, ValueError):
+            await update.message.reply_text("❌ Usage: /shards <count> (1 or more)")
+            return
+
+        if not resize_forwarders(count):
+            await update.message.reply_text("❌ Forwarders are not running in sharded mode.")
+            return
+        await update.message.reply_text(f"🧩 Rebalancing forwarders across {count} shards...")
+    except Exception as e:
+        print(f"❌ Shards command error: {e}")
+
+
 # ================== CALLBACK HANDLER ==================
 async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
@@ -171,6 +254,45 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     reply_markup=main_menu_keyboard()
                 )
 
+        elif query.data.startswith("update_content_"):
+            try:
+                parts = query.data.split("_", 3)
+                if len(parts) < 4:
+                    raise ValueError("Invalid callback data format")
+                _, _, uid, phone = parts
+                await user_manage.cycle_content_mode(update, context, int(uid), phone)
+            except (ValueError, IndexError):
+                await query.edit_message_caption(
+                    caption="❌ Failed to change forwarded content.",
+                    reply_markup=main_menu_keyboard()
+                )
+
+        elif query.data.startswith("update_repost_"):
+            try:
+                parts = query.data.split("_", 3)
+                if len(parts) < 4:
+                    raise ValueError("Invalid callback data format")
+                _, _, uid, phone = parts
+                await user_manage.cycle_repost_interval(update, context, int(uid), phone)
+            except (ValueError, IndexError):
+                await query.edit_message_caption(
+                    caption="❌ Failed to change re-post interval.",
+                    reply_markup=main_menu_keyboard()
+                )
+
+        elif query.data.startswith("update_mode_"):
+            try:
+                parts = query.data.split("_", 3)
+                if len(parts) < 4:
+                    raise ValueError("Invalid callback data format")
+                _, _, uid, phone = parts
+                await user_manage.toggle_forward_mode(update, context, int(uid), phone)
+            except (ValueError, IndexError):
+                await query.edit_message_caption(
+                    caption="❌ Failed to change forward mode.",
+                    reply_markup=main_menu_keyboard()
+                )
+
         elif query.data.startswith("update_expiry_"):
             try:
                 parts = query.data.split("_", 3)
@@ -277,10 +399,10 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 parts = query.data.split("_", 2)
                 if len(parts) < 3:
                     raise ValueError("Invalid callback data format")
-                _, phone, idx = parts
+                _, phone, target_id = parts
                 if not phone:
                     raise ValueError("Empty phone number")
-                await update_urls.confirm_delete_url(update, context, phone, int(idx))
+                await update_urls.confirm_delete_url(update, context, phone, int(target_id))
             except (ValueError, IndexError):
                 await query.edit_message_caption(
                     caption="❌ Failed to delete URL.",
@@ -425,6 +547,8 @@ def main():
 
         # Handlers
         app.add_handler(CommandHandler("start", start))
+        app.add_handler(CommandHandler("status", status_command))
+        app.add_handler(CommandHandler("shards", shards_command))
         app.add_handler(CallbackQueryHandler(button_handler))
         app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, message_handler))
 
@@ -439,6 +563,7 @@ def main():
         async def shutdown(_: Application):
             try:
                 await stop_forwarders()
+                close_pool()
                 print("🛑 Forwarders stopped, bot shutdown complete.")
             except Exception as e:
                 print(f"❌ Error during shutdown: {e}")
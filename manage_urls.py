@@ -1,7 +1,7 @@
 import asyncio
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
-from database import update_user_urls, get_user_by_phone
+from async_database import update_user_urls, get_user_by_phone
 
 # Temporary storage for step tracking
 url_states = {}  # {user_id: {"step": "entering", "message_id": int, "phone": str}}
@@ -33,7 +33,7 @@ async def start_manage_urls(update: Update, context: ContextTypes.DEFAULT_TYPE,
     url_states[user_id] = {"step": "entering", "message_id": message_id, "phone": phone}
 
     # Fetch existing URLs
-    user = get_user_by_phone(phone)
+    user = await get_user_by_phone(phone)
     existing_urls = []
     if user and user[6]:  # urls column index
         try:
@@ -77,7 +77,7 @@ async def handle_urls_input(update: Update, context: ContextTypes.DEFAULT_TYPE,
             return
 
         # Save to DB
-        update_user_urls(phone, urls)
+        await update_user_urls(phone, urls)
 
         # Show confirmation on same message
         await context.bot.edit_message_caption(
@@ -0,0 +1,229 @@
+# ================== SHARDS.PY ==================
+import asyncio
+import multiprocessing
+import queue
+import signal
+import time
+import zlib
+
+from config import SHARD_STATUS_INTERVAL
+
+
+def shard_of(phone, count):
+    """Stable shard index for a phone (rendezvous hashing, so resizing moves few accounts)"""
+    phone = str(phone)
+    return max(range(count), key=lambda index: zlib.crc32(f"{index}:{phone}".encode()))
+
+
+# =============================
+# Shard process
+# =============================
+def _shard_main(index, count, status_queue, control_queue):
+    """Entry point of a shard process: runs a supervisor for the accounts it owns"""
+    # Ctrl+C reaches the whole process group; shutdown is driven by the host
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        asyncio.run(_shard_loop(index, count, status_queue, control_queue))
+    except Exception as e:
+        print(f"❌ Shard {index}: Crashed: {e}")
+
+
+async def _shard_loop(index, count, status_queue, control_queue):
+    import forwarder
+
+    forwarder.configure_shard(index, count)
+    supervisor_task = asyncio.create_task(forwarder.supervisor())
+    print(f"🧩 Shard {index}/{count} started (pid {multiprocessing.current_process().pid})")
+
+    last_report = 0.0
+    while not supervisor_task.done():
+        try:
+            while True:
+                command = control_queue.get_nowait()
+                if command[0] == "release":
+                    # First half of a resize: stop the accounts this shard loses
+                    await forwarder.release_shard(command[1])
+                    status_queue.put({"shard": index, "released": command[1]})
+                elif command[0] == "resize":
+                    forwarder.configure_shard(index, command[1])
+                elif command[0] == "stop":
+                    forwarder._stop_main.set()
+        except queue.Empty:
+            pass
+
+        if time.time() - last_report >= SHARD_STATUS_INTERVAL:
+            status = forwarder.get_status()
+            status.update(shard=index, pid=multiprocessing.current_process().pid, time=time.time())
+            status_queue.put(status)
+            last_report = time.time()
+
+        await asyncio.sleep(1.0)
+
+    print(f"✅ Shard {index}: Stopped")
+
+
+def _merge_pacing(summaries, slowest=5):
+    """Combine per-shard pacing summaries (see forwarder.pacing_summary)"""
+    summaries = [summary for summary in summaries if summary]
+    if not summaries:
+        return {}
+    slow = [account for summary in summaries for account in summary["slowest"]]
+    return {
+        "min_interval": min(summary["min_interval"] for summary in summaries),
+        "avg_interval": round(sum(summary["avg_interval"] for summary in summaries) / len(summaries), 3),
+        "max_interval": max(summary["max_interval"] for summary in summaries),
+        "slow_cadence": sum(summary["slow_cadence"] for summary in summaries),
+        "slowest": sorted(slow, key=lambda account: account["interval"], reverse=True)[:slowest],
+    }
+
+
+def _merge_memory(summaries):
+    """Combine per-shard memory summaries (see forwarder.memory_summary)"""
+    summaries = [summary for summary in summaries if summary]
+    clients = sum(summary["clients"] for summary in summaries)
+    client_total = sum(summary["client_total"] for summary in summaries)
+    return {
+        "rss": sum(summary["rss"] for summary in summaries),
+        "clients": clients,
+        "client_total": client_total,
+        "client_avg": client_total // clients if clients else 0,
+    }
+
+
+# =============================
+# Host (bot process)
+# =============================
+class ShardHost:
+    """Spawns and watches the shard processes and collects their status reports"""
+
+    def __init__(self, count):
+        self.count = count
+        self.status = {}  # shard index -> last status report
+        self._ctx = multiprocessing.get_context("spawn")
+        self._status_queue = self._ctx.Queue()
+        self._shards = {}  # shard index -> (process, control queue)
+        self._retiring = []
+        self._released = {}  # shard index -> count it released its lost accounts for
+        self._resize_lock = asyncio.Lock()
+        self._resize_task = None
+        self._monitor_task = None
+
+    def start(self):
+        for index in range(self.count):
+            self._spawn(index)
+        self._monitor_task = asyncio.create_task(self._monitor())
+
+    def _spawn(self, index):
+        control_queue = self._ctx.Queue()
+        process = self._ctx.Process(
+            target=_shard_main,
+            args=(index, self.count, self._status_queue, control_queue),
+            name=f"forwarder-shard-{index}",
+            daemon=True,
+        )
+        process.start()
+        self._shards[index] = (process, control_queue)
+
+    def resize(self, count):
+        """Change the shard count in the background (see _reshard)"""
+        self._resize_task = asyncio.create_task(self._reshard(count))
+
+    async def _reshard(self, count, timeout=30.0):
+        """Change the shard count without two processes running the same account.
+
+        Retiring shards stop and surviving shards release the accounts they
+        lose first; only then do survivors and new shards adopt their new
+        accounts.
+        """
+        async with self._resize_lock:
+            if count < 1 or count == self.count:
+                return
+            old_count = self.count
+            survivors = range(min(count, old_count))
+            print(f"🧩 Resharding forwarders: {old_count} -> {count}")
+
+            retiring = []
+            for index in range(count, old_count):
+                process, control_queue = self._shards.pop(index)
+                control_queue.put(("stop",))
+                retiring.append(process)
+                self.status.pop(index, None)
+            self._retiring += retiring
+            for index in survivors:
+                self._shards[index][1].put(("release", count))
+
+            deadline = time.time() + timeout
+            while time.time() < deadline and (
+                any(process.is_alive() for process in retiring)
+                or any(self._released.get(index) != count for index in survivors)
+            ):
+                await asyncio.sleep(0.5)
+            for process in retiring:
+                if process.is_alive():
+                    print(f"⚠️ {process.name} didn't stop gracefully, terminating...")
+                    process.terminate()
+            pending = [index for index in survivors if self._released.get(index) != count]
+            if pending:
+                print(f"⚠️ Shard(s) {pending} did not confirm the handoff within {timeout:.0f}s")
+
+            self.count = count
+            for index in survivors:
+                self._shards[index][1].put(("resize", count))
+            for index in range(old_count, count):
+                self._spawn(index)
+
+    async def _monitor(self):
+        while True:
+            try:
+                while True:
+                    report = self._status_queue.get_nowait()
+                    if "released" in report:
+                        self._released[report["shard"]] = report["released"]
+                    elif report["shard"] in self._shards:
+                        self.status[report["shard"]] = report
+            except queue.Empty:
+                pass
+
+            for index, (process, _) in list(self._shards.items()):
+                if not process.is_alive():
+                    print(f"⚠️ Shard {index} exited (code {process.exitcode}), restarting...")
+                    self._spawn(index)
+            self._retiring = [process for process in self._retiring if process.is_alive()]
+
+            await asyncio.sleep(1.0)
+
+    def get_status(self):
+        """Aggregate the latest report of every shard"""
+        shards = [self.status.get(index) for index in sorted(self._shards)]
+        reported = [report for report in shards if report]
+        return {
+            "shards": self.count,
+            "accounts": sum(report["accounts"] for report in reported),
+            "in_flight": sum(report["in_flight"] for report in reported),
+            "pacing": _merge_pacing([report.get("pacing") for report in reported]),
+            "memory": _merge_memory([report.get("memory") for report in reported]),
+            "coordination": {
+                key: sum((report.get("coordination") or {}).get(key, 0) for report in reported)
+                for key in ("shared", "held")
+            },
+            "per_shard": shards,
+        }
+
+    async def stop(self, timeout=15.0):
+        if self._resize_task:
+            self._resize_task.cancel()
+        if self._monitor_task:
+            self._monitor_task.cancel()
+        processes = [process for process, _ in self._shards.values()] + self._retiring
+        for _, control_queue in self._shards.values():
+            control_queue.put(("stop",))
+
+        deadline = time.time() + timeout
+        while any(process.is_alive() for process in processes) and time.time() < deadline:
+            await asyncio.sleep(0.5)
+        for process in processes:
+            if process.is_alive():
+                print(f"⚠️ {process.name} didn't stop gracefully, terminating...")
+                process.terminate()
+        self._shards.clear()
+        self._retiring = []
@@ -0,0 +1,67 @@
+# ================== TARGETS.PY ==================
+import re
+
+from entity_cache import cache_key
+
+# Tried in order; the first match decides the URL type
+URL_PATTERNS = [
+    (re.compile(r"https?://t\.me/c/(-?\d+)/(\d+)/?$"), "private_topic"),
+    (re.compile(r"https?://t\.me/c/(-?\d+)/?$"), "private_channel"),
+    (re.compile(r"https?://t\.me/([^/c][^/]+)/(\d+)/?$"), "public_topic"),
+    (re.compile(r"https?://t\.me/([^/c][^/]+)/?$"), "public"),
+    (re.compile(r"^@([^/]+)/?$"), "username"),
+    (re.compile(r"^(-?\d+)$"), "chat_id"),
+]
+
+
+def _channel_id(raw):
+    chat_id = int(raw)
+    if chat_id > 0:
+        chat_id = int("-100" + str(chat_id))
+    return chat_id
+
+
+def parse_telegram_url(url):
+    """Parse a target URL into (identifier, topic_id, url_type, chat_id)"""
+    try:
+        url = url.strip()
+        for pattern, url_type in URL_PATTERNS:
+            match = pattern.match(url)
+            if not match:
+                continue
+            if url_type == "private_topic":
+                chat_id = _channel_id(match.group(1))
+                return str(chat_id), int(match.group(2)), url_type, chat_id
+            elif url_type == "private_channel":
+                chat_id = _channel_id(match.group(1))
+                return str(chat_id), None, url_type, chat_id
+            elif url_type == "public_topic":
+                return match.group(1), int(match.group(2)), url_type, None
+            elif url_type in ("public", "username"):
+                return match.group(1), None, url_type, None
+            elif url_type == "chat_id":
+                chat_id = int(match.group(1))
+                return str(chat_id), None, url_type, chat_id
+        return url, None, "unknown", None
+    except Exception as e:
+        print(f"❌ Parse URL error: {e}")
+        return url, None, "unknown", None
+
+
+class Target:
+    """A target URL parsed once, holding everything the forwarding loop needs"""
+
+    __slots__ = ("url", "identifier", "topic_id", "url_type", "chat_id", "key")
+
+    def __init__(self, url):
+        self.url = url
+        self.identifier, self.topic_id, self.url_type, self.chat_id = parse_telegram_url(url)
+        self.key = cache_key(self.identifier, self.chat_id, self.url_type)
+
+    def __repr__(self):
+        return f"Target({self.url!r}, {self.url_type})"
+
+
+def compile_targets(urls):
+    """Build the Target table for a worker's URL list (once per config change)"""
+    return tuple(Target(url) for url in urls)
@@ -1,89 +1,77 @@
 # ================== UPDATE_URLS.PY ==================
 import math
-import json
 import re
 import asyncio
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from config import ITEMS_PER_PAGE
-from database import get_db_cursor, db_lock, update_user_urls as db_update_user_urls
+import async_database
+from database import get_db_cursor, get_user_targets, update_user_urls, delete_user_target
 
 
 # ================== DB HELPER ==================
-def get_all_users():
-    """Get all users with their basic info for URL management"""
+def get_all_users(offset=0, limit=ITEMS_PER_PAGE):
+    """Get one page of users as (phone, api_id, url_count) tuples for URL management"""
     try:
-        with db_lock:
-            with get_db_cursor(commit=False) as cursor:
-                if cursor is None:
-                    return []
-                
-                cursor.execute("""
-                    SELECT phone, api_id, urls 
-                    FROM users 
-                    ORDER BY created_at DESC
-                """)
-                rows = cursor.fetchall()
-                
-                # Convert to list of tuples for compatibility
-                return [(row['phone'], row['api_id'], row['urls']) for row in rows]
+        with get_db_cursor(commit=False) as cursor:
+            if cursor is None:
+                return []
+            
+            # Page the users first, then count only that page's targets
+            cursor.execute("""
+                SELECT u.phone, u.api_id, COUNT(t.id) AS url_count
+                FROM (
+                    SELECT id, phone, api_id, created_at
+                    FROM users
+                    ORDER BY created_at DESC, id
+                    LIMIT %s OFFSET %s
+                ) u
+                LEFT JOIN targets t ON t.user_id = u.id
+                GROUP BY u.id, u.phone, u.api_id, u.created_at
+                ORDER BY u.created_at DESC, u.id
+            """, (limit, offset))
+            return [(row['phone'], row['api_id'], row['url_count']) for row in cursor.fetchall()]
     except Exception as e:
         print(f"❌ Get all users error: {e}")
         return []
 
 
-def get_user_urls(phone: str):
-    """Get URLs for a specific user"""
+def get_url_counts():
+    """Count users, users with at least one URL and URLs, aggregated in MySQL"""
     try:
-        with db_lock:
-            with get_db_cursor(commit=False) as cursor:
-                if cursor is None:
-                    return None
-                
-                cursor.execute("SELECT urls FROM users WHERE phone = %s", (phone,))
-                row = cursor.fetchone()
-                
-                if not row:
-                    return None
-                
-                try:
-                    urls_data = row['urls']
-                    return json.loads(urls_data) if urls_data else []
-                except (json.JSONDecodeError, TypeError):
-                    print(f"⚠️ Invalid JSON data for user {phone}, returning empty list")
-                    return []
+        with get_db_cursor(commit=False) as cursor:
+            if cursor is None:
+                return None
+            
+            cursor.execute("""
+                SELECT
+                    (SELECT COUNT(*) FROM users) AS total_users,
+                    COUNT(DISTINCT user_id) AS users_with_urls,
+                    COUNT(*) AS total_urls
+                FROM targets
+            """)
+            return cursor.fetchone()
     except Exception as e:
-        print(f"❌ Get user URLs error: {e}")
-        return []
+        print(f"❌ Get URL counts error: {e}")
+        return None
 
 
-def update_user_urls(phone: str, urls: list):
-    """Update URLs for a specific user"""
-    try:
-        with db_lock:
-            with get_db_cursor() as cursor:
-                if cursor is None:
-                    return False
-                
-                urls_json = json.dumps(urls) if urls else '[]'
-                cursor.execute("UPDATE users SET urls = %s WHERE phone = %s", (urls_json, phone))
-                return cursor.rowcount > 0
-    except Exception as e:
-        print(f"❌ Update user URLs error: {e}")
-        return False
+def get_user_urls(phone: str):
+    """Get URLs for a specific user"""
+    targets = get_user_targets(phone)
+    return [target['raw_url'] for target in targets] if targets is not None else None
 
 
 def user_exists(phone: str):
     """Check if user exists in database"""
     try:
-        with db_lock:
-            with get_db_cursor(commit=False) as cursor:
-                if cursor is None:
-                    return False
-                
-                cursor.execute("SELECT COUNT(*) as count FROM users WHERE phone = %s", (phone,))
-                result = cursor.fetchone()
-                return result['count'] > 0 if result else False
+        with get_db_cursor(commit=False) as cursor:
+            if cursor is None:
+                return False
+            
+            cursor.execute("SELECT COUNT(*) as count FROM users WHERE phone = %s", (phone,))
+            result = cursor.fetchone()
+            return result['count'] > 0 if result else False
     except Exception as e:
         print(f"❌ User exists check error: {e}")
         return False
@@ -146,8 +134,7 @@ def validate_telegram_url(url: str) -> bool:
 async def show_user_list(update: Update, context: ContextTypes.DEFAULT_TYPE, page=1):
     """Show paginated list of users for URL management"""
     try:
-        users = get_all_users()
-        total = len(users)
+        total = await async_database.get_user_count()
 
         if total == 0:
             await update.callback_query.message.edit_caption(
@@ -157,21 +144,11 @@ async def show_user_list(update: Update, context: ContextTypes.DEFAULT_TYPE, pag
             return
 
         pages = math.ceil(total / ITEMS_PER_PAGE)
-        start = (page - 1) * ITEMS_PER_PAGE
-        end = start + ITEMS_PER_PAGE
-        users_slice = users[start:end]
+        page = min(max(1, page), pages)
+        users_slice = await async_database.run(get_all_users, (page - 1) * ITEMS_PER_PAGE, ITEMS_PER_PAGE)
 
         keyboard = []
-        for phone, api_id, urls in users_slice:
-            # Count URLs for display
-            url_count = 0
-            if urls:
-                try:
-                    url_list = json.loads(urls) if isinstance(urls, str) else urls
-                    url_count = len(url_list) if isinstance(url_list, list) else 0
-                except:
-                    url_count = 0
-            
+        for phone, api_id, url_count in users_slice:
             display_text = f"{phone} | {api_id} ({url_count} URLs)"
             keyboard.append([InlineKeyboardButton(display_text, callback_data=f"user_{phone}")])
 
@@ -203,14 +180,14 @@ async def show_user_list(update: Update, context: ContextTypes.DEFAULT_TYPE, pag
 async def show_user_urls(update: Update, context: ContextTypes.DEFAULT_TYPE, phone: str):
     """Show URLs for a specific user"""
     try:
-        if not user_exists(phone):
+        if not await async_database.run(user_exists, phone):
             await update.callback_query.message.edit_caption(
                 caption="❌ User not found in database.",
                 reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("⬅️ Back", callback_data="update_urls")]])
             )
             return
 
-        urls = get_user_urls(phone)
+        urls = await async_database.run(get_user_urls, phone)
 
         if urls is None:
             await update.callback_query.message.edit_caption(
@@ -259,7 +236,7 @@ async def show_user_urls(update: Update, context: ContextTypes.DEFAULT_TYPE, pho
 async def start_add_urls(update: Update, context: ContextTypes.DEFAULT_TYPE, phone: str):
     """Start the process of adding new URLs"""
     try:
-        if not user_exists(phone):
+        if not await async_database.run(user_exists, phone):
             await update.callback_query.message.edit_caption(
                 caption="❌ User not found in database.",
                 reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("⬅️ Back", callback_data="update_urls")]])
@@ -347,20 +324,9 @@ async def save_new_urls(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 pass
             return
 
-        # Get existing URLs and merge
-        old_urls = get_user_urls(phone) or []
-        combined_urls = old_urls + new_urls
-        
-        # Remove duplicates while preserving order
-        final_urls = []
-        seen = set()
-        for url in combined_urls:
-            if url not in seen:
-                final_urls.append(url)
-                seen.add(url)
-
-        # Save to database
-        success = update_user_urls(phone, final_urls)
+        # Append as new target rows; URLs the user already has are skipped
+        result = await async_database.add_user_targets(phone, new_urls)
+        success = result is not None
 
         # Delete user's input message
         try:
@@ -370,8 +336,7 @@ async def save_new_urls(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         if success:
             # Show success message briefly
-            added_count = len(new_urls)
-            total_count = len(final_urls)
+            added_count, total_count = result
             
             success_msg = await context.bot.send_message(
                 chat_id=chat_id,
@@ -442,36 +407,37 @@ async def save_new_urls(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def start_delete_urls(update: Update, context: ContextTypes.DEFAULT_TYPE, phone: str):
     """Start the process of deleting URLs"""
     try:
-        if not user_exists(phone):
+        if not await async_database.run(user_exists, phone):
             await update.callback_query.message.edit_caption(
                 caption="❌ User not found in database.",
                 reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("⬅️ Back", callback_data="update_urls")]])
             )
             return
 
-        urls = get_user_urls(phone)
+        targets = await async_database.get_user_targets(phone)
 
-        if urls is None:
+        if targets is None:
             caption = "❌ Error loading user data."
             markup = InlineKeyboardMarkup([[InlineKeyboardButton("⬅ Back", callback_data=f"user_{phone}")]])
-        elif not urls:
+        elif not targets:
             caption = "ℹ️ No URLs available to delete."
             markup = InlineKeyboardMarkup([[InlineKeyboardButton("⬅ Back", callback_data=f"user_{phone}")]])
         else:
-            caption = f"🗑 Select a URL to delete:\n📊 Total: {len(urls)} URLs"
+            caption = f"🗑 Select a URL to delete:\n📊 Total: {len(targets)} URLs"
             keyboard = []
             
-            for idx, u in enumerate(urls):
-                formatted_url = format_url_display(u)
+            for idx, target in enumerate(targets):
+                formatted_url = format_url_display(target['raw_url'])
                 # Truncate long URLs for button display
                 if len(formatted_url) > 35:
                     label = f"{idx+1}. {formatted_url[:32]}..."
                 else:
                     label = f"{idx+1}. {formatted_url}"
-                keyboard.append([InlineKeyboardButton(label, callback_data=f"delurl_{phone}_{idx}")])
+                # Target id, not list index: stays correct if the list changed meanwhile
+                keyboard.append([InlineKeyboardButton(label, callback_data=f"delurl_{phone}_{target['id']}")])
             
             # Add bulk actions
-            if len(urls) > 1:
+            if len(targets) > 1:
                 keyboard.append([InlineKeyboardButton("🗑 Delete All URLs", callback_data=f"delallurls_{phone}")])
             
             keyboard.append([InlineKeyboardButton("⬅ Back", callback_data=f"user_{phone}")])
@@ -487,40 +453,22 @@ async def start_delete_urls(update: Update, context: ContextTypes.DEFAULT_TYPE,
         )
 
 
-async def confirm_delete_url(update: Update, context: ContextTypes.DEFAULT_TYPE, phone: str, index: int):
-    """Delete a specific URL by index"""
+async def confirm_delete_url(update: Update, context: ContextTypes.DEFAULT_TYPE, phone: str, target_id: int):
+    """Delete a specific URL by target id"""
     try:
-        if not user_exists(phone):
+        if not await async_database.run(user_exists, phone):
             await update.callback_query.message.edit_caption(
                 caption="❌ User not found in database.",
                 reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("⬅️ Back", callback_data="update_urls")]])
             )
             return
 
-        urls = get_user_urls(phone)
+        deleted_url = await async_database.delete_user_target(phone, target_id)
 
-        if urls is None:
-            await update.callback_query.message.edit_caption(
-                caption="❌ Error loading user data.",
-                reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("⬅ Back", callback_data=f"user_{phone}")]])
-            )
-            return
-
-        if 0 <= index < len(urls):
-            deleted_url = urls[index]
-            urls.pop(index)
-            success = update_user_urls(phone, urls)
-            
-            if success:
-                # Show success message briefly
-                success_text = f"✅ URL deleted successfully!\n🗑 Removed: {format_url_display(deleted_url)}"
-                await update.callback_query.answer(text="URL deleted successfully!")
-            else:
-                await update.callback_query.message.edit_caption(
-                    caption="❌ Failed to delete URL from database. Please try again.",
-                    reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("⬅ Back", callback_data=f"user_{phone}")]])
-                )
-                return
+        if deleted_url:
+            # Show success message briefly
+            success_text = f"✅ URL deleted successfully!\n🗑 Removed: {format_url_display(deleted_url)}"
+            await update.callback_query.answer(text="URL deleted successfully!")
         else:
             await update.callback_query.answer(text="❌ Invalid URL selection!", show_alert=True)
 
@@ -538,14 +486,14 @@ async def confirm_delete_url(update: Update, context: ContextTypes.DEFAULT_TYPE,
 async def confirm_delete_all_urls(update: Update, context: ContextTypes.DEFAULT_TYPE, phone: str):
     """Delete all URLs for a user with confirmation"""
     try:
-        if not user_exists(phone):
+        if not await async_database.run(user_exists, phone):
             await update.callback_query.message.edit_caption(
                 caption="❌ User not found in database.",
                 reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("⬅️ Back", callback_data="update_urls")]])
             )
             return
 
-        urls = get_user_urls(phone)
+        urls = await async_database.run(get_user_urls, phone)
         
         if not urls:
             await update.callback_query.message.edit_caption(
@@ -577,7 +525,7 @@ async def confirm_delete_all_urls(update: Update, context: ContextTypes.DEFAULT_
 async def execute_delete_all_urls(update: Update, context: ContextTypes.DEFAULT_TYPE, phone: str):
     """Actually delete all URLs after confirmation"""
     try:
-        success = update_user_urls(phone, [])
+        success = await async_database.run(update_user_urls, phone, [])
         
         if success:
             await update.callback_query.answer(text="All URLs deleted successfully!")
@@ -599,20 +547,12 @@ async def execute_delete_all_urls(update: Update, context: ContextTypes.DEFAULT_
 async def get_url_statistics():
     """Get statistics about URLs across all users"""
     try:
-        users = get_all_users()
-        total_users = len(users)
-        users_with_urls = 0
-        total_urls = 0
-        
-        for phone, api_id, urls_data in users:
-            if urls_data:
-                try:
-                    urls = json.loads(urls_data) if isinstance(urls_data, str) else urls_data
-                    if urls and len(urls) > 0:
-                        users_with_urls += 1
-                        total_urls += len(urls)
-                except:
-                    continue
+        counts = await async_database.run(get_url_counts)
+        if not counts:
+            return {}
+        total_users = counts['total_users']
+        users_with_urls = counts['users_with_urls']
+        total_urls = counts['total_urls']
         
         return {
             'total_users': total_users,
@@ -629,15 +569,12 @@ async def get_url_statistics():
 def cleanup_invalid_urls(phone: str):
     """Clean up invalid URLs for a specific user"""
     try:
-        urls = get_user_urls(phone)
-        if not urls:
-            return True
-        
-        valid_urls = [url for url in urls if validate_telegram_url(url)]
-        
-        if len(valid_urls) != len(urls):
-            return update_user_urls(phone, valid_urls)
-        
+        targets = get_user_targets(phone)
+        if targets is None:
+            return False
+        for target in targets:
+            if not validate_telegram_url(target['raw_url']):
+                delete_user_target(phone, target['id'])
         return True
     except Exception as e:
         print(f"❌ Cleanup invalid URLs error: {e}")
@@ -1,7 +1,7 @@
 # ================== USER_MANAGE.PY (Enhanced Version) ==================
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.ext import ContextTypes
-from database import (
+from async_database import (
     get_all_users,
     get_user_count,
     get_user_by_id,
@@ -10,6 +10,10 @@ from database import (
     update_user_expiry_days,
     set_forwarding,
     get_user_by_phone,
+    update_user_forward_mode,
+    get_target_health,
+    update_user_repost_interval,
+    update_user_content_mode,
 )
 import os
 import asyncio
@@ -91,8 +95,8 @@ def manage_users_keyboard():
 async def show_user_list(update: Update, context: ContextTypes.DEFAULT_TYPE, page=0):
     try:
         query = update.callback_query
-        users = get_all_users(offset=page * 5, limit=5)
-        total = get_user_count()
+        users = await get_all_users(offset=page * 5, limit=5)
+        total = await get_user_count()
 
         if not users:
             await query.edit_message_caption(
@@ -104,7 +108,7 @@ async def show_user_list(update: Update, context: ContextTypes.DEFAULT_TYPE, pag
         keyboard = []
         for uid, phone, api_id in users:
             # Get user details for status indicators
-            user = get_user_by_id(uid)
+            user = await get_user_by_id(uid)
             status_icon = "🟢" if user and user.get('auto_forwarding') else "🔴"
             keyboard.append([InlineKeyboardButton(
                 f"{status_icon} {phone}", 
@@ -146,7 +150,7 @@ async def show_user_list(update: Update, context: ContextTypes.DEFAULT_TYPE, pag
 async def show_user_details(update: Update, context: ContextTypes.DEFAULT_TYPE, uid: int):
     try:
         query = update.callback_query
-        user = get_user_by_id(uid)
+        user = await get_user_by_id(uid)
         if not user:
             await query.edit_message_caption(
                 caption="⚠️ User not found or has been deleted.", 
@@ -175,6 +179,10 @@ async def show_user_details(update: Update, context: ContextTypes.DEFAULT_TYPE,
         expiry_display = format_expiry_display(user.get('expiry_date'))
         forwarding_status = "✅ Enabled" if user.get('auto_forwarding') else "❌ Disabled"
         forwarding_icon = "🟢" if user.get('auto_forwarding') else "🔴"
+        mode_display = format_mode_display(user.get('forward_mode'), user.get('max_concurrency'))
+        health_display = format_health_display(await get_target_health(user['phone']))
+        repost_display = format_repost_display(user.get('repost_interval'))
+        content_display = format_content_display(user.get('content_mode'), user.get('content_count'))
 
         caption = (
             f"👤 **User Details**\n\n"
@@ -182,9 +190,13 @@ async def show_user_details(update: Update, context: ContextTypes.DEFAULT_TYPE,
             f"🆔 **API ID:** `{user['api_id']}`\n"
             f"⏱ **Delay:** {delay_display}\n"
             f"{forwarding_icon} **Forwarding:** {forwarding_status}\n"
+            f"⚡ **Mode:** {mode_display}\n"
+            f"🔂 **Re-post:** {repost_display}\n"
+            f"📦 **Content:** {content_display}\n"
             f"📅 **Expiry:** {expiry_display}\n"
             f"📡 **Log Channel:** {log_channel_display}\n"
             f"🔗 **URLs:** {urls_display}\n"
+            f"🩺 **Targets:** {health_display}\n"
             f"📌 **Created:** {user.get('created_at', 'Unknown')}\n"
         )
 
@@ -193,6 +205,14 @@ async def show_user_details(update: Update, context: ContextTypes.DEFAULT_TYPE,
                 f"🔁 {'Disable' if user.get('auto_forwarding') else 'Enable'} Forwarding", 
                 callback_data=f"update_forward_{uid}_{user['phone']}"
             )],
+            [InlineKeyboardButton(
+                f"⚡ Switch to {'Sequential' if user.get('forward_mode') == 'concurrent' else 'Concurrent'}",
+                callback_data=f"update_mode_{uid}_{user['phone']}"
+            )],
+            [
+                InlineKeyboardButton("🔂 Re-post Interval", callback_data=f"update_repost_{uid}_{user['phone']}"),
+                InlineKeyboardButton("📦 Content", callback_data=f"update_content_{uid}_{user['phone']}")
+            ],
             [
                 InlineKeyboardButton("⏱ Update Delay", callback_data=f"update_delay_{uid}_{user['phone']}"),
                 InlineKeyboardButton("📅 Update Expiry", callback_data=f"update_expiry_{uid}_{user['phone']}")
@@ -225,7 +245,7 @@ async def show_user_details(update: Update, context: ContextTypes.DEFAULT_TYPE,
 async def confirm_delete_prompt(update: Update, context: ContextTypes.DEFAULT_TYPE, uid, phone):
     try:
         query = update.callback_query
-        user = get_user_by_id(uid)
+        user = await get_user_by_id(uid)
         
         if not user:
             await query.edit_message_caption(
@@ -291,7 +311,7 @@ async def confirm_delete(update: Update, context: ContextTypes.DEFAULT_TYPE, uid
         )
 
         # Delete from database first
-        success = delete_user(uid)
+        success = await delete_user(uid)
         
         # Remove session files
         session_patterns = [
@@ -390,7 +410,7 @@ async def start_update_delay(update: Update, context: ContextTypes.DEFAULT_TYPE,
         }
         
         # Get current delay
-        user = get_user_by_id(uid)
+        user = await get_user_by_id(uid)
         current_delay = user.get('delay', 5) if user else 5
         current_display = format_delay_display(current_delay)
         
@@ -443,7 +463,7 @@ async def save_update_delay(update: Update, context: ContextTypes.DEFAULT_TYPE,
             raise ValueError("Delay cannot exceed 7 days")
             
         # Update database
-        success = update_user_delay(phone, delay)
+        success = await update_user_delay(phone, delay)
         
         if success:
             delay_display = format_delay_display(delay)
@@ -457,7 +477,7 @@ async def save_update_delay(update: Update, context: ContextTypes.DEFAULT_TYPE,
             )
             
             # Return to user details
-            user = get_user_by_phone(phone)
+            user = await get_user_by_phone(phone)
             if user:
                 # Small delay to show success message
                 await asyncio.sleep(1)
@@ -523,7 +543,7 @@ async def start_update_expiry(update: Update, context: ContextTypes.DEFAULT_TYPE
         }
         
         # Get current expiry
-        user = get_user_by_id(uid)
+        user = await get_user_by_id(uid)
         current_expiry = format_expiry_display(user.get('expiry_date') if user else None)
         
         await query.edit_message_caption(
@@ -574,7 +594,7 @@ async def save_update_expiry(update: Update, context: ContextTypes.DEFAULT_TYPE,
             raise ValueError("Extension cannot exceed 10 years")
             
         # Update database
-        success = update_user_expiry_days(phone, days)
+        success = await update_user_expiry_days(phone, days)
         
         if success:
             # Calculate new expiry date
@@ -591,7 +611,7 @@ async def save_update_expiry(update: Update, context: ContextTypes.DEFAULT_TYPE,
             )
             
             # Return to user details
-            user = get_user_by_phone(phone)
+            user = await get_user_by_phone(phone)
             if user:
                 await asyncio.sleep(1)
                 await show_user_details(update, context, user['id'])
@@ -642,7 +662,7 @@ async def save_update_expiry(update: Update, context: ContextTypes.DEFAULT_TYPE,
 async def toggle_forwarding(update: Update, context: ContextTypes.DEFAULT_TYPE, uid, phone):
     try:
         query = update.callback_query
-        user = get_user_by_id(uid)
+        user = await get_user_by_id(uid)
         
         if not user:
             await query.edit_message_caption(
@@ -660,7 +680,7 @@ async def toggle_forwarding(update: Update, context: ContextTypes.DEFAULT_TYPE,
             parse_mode="Markdown"
         )
         
-        success = set_forwarding(phone, new_status)
+        success = await set_forwarding(phone, new_status)
         
         if success:
             status_text = "✅ Enabled" if new_status else "❌ Disabled"
@@ -706,7 +726,203 @@ async def toggle_forwarding(update: Update, context: ContextTypes.DEFAULT_TYPE,
         )
 
 
+# ================== FORWARD MODE TOGGLE ==================
+async def toggle_forward_mode(update: Update, context: ContextTypes.DEFAULT_TYPE, uid, phone):
+    try:
+        query = update.callback_query
+        user = await get_user_by_id(uid)
+        
+        if not user:
+            await query.edit_message_caption(
+                caption="❌ User not found or has been deleted.",
+                reply_markup=manage_users_keyboard()
+            )
+            return
+            
+        new_mode = "sequential" if user.get("forward_mode") == "concurrent" else "concurrent"
+        success = await update_user_forward_mode(phone, new_mode, user.get("max_concurrency"))
+        
+        if success:
+            await show_user_details(update, context, uid)
+        else:
+            await query.edit_message_caption(
+                caption=(
+                    f"❌ **Update Failed**\n\n"
+                    f"Could not change forward mode for `{phone}`.\n"
+                    f"Please check database connection and try again."
+                ),
+                parse_mode="Markdown",
+                reply_markup=InlineKeyboardMarkup([[
+                    InlineKeyboardButton("🔄 Retry", callback_data=f"update_mode_{uid}_{phone}"),
+                    InlineKeyboardButton("⬅️ Back", callback_data=f"userdetails_{uid}")
+                ]])
+            )
+    except Exception as e:
+        print(f"❌ Toggle forward mode error: {e}")
+        await query.edit_message_caption(
+            caption="❌ System error while changing forward mode. Please try again.",
+            reply_markup=InlineKeyboardMarkup([[
+                InlineKeyboardButton("⬅️ Back", callback_data=f"userdetails_{uid}")
+            ]])
+        )
+
+
+# ================== RE-POST INTERVAL ==================
+async def cycle_repost_interval(update: Update, context: ContextTypes.DEFAULT_TYPE, uid, phone):
+    try:
+        query = update.callback_query
+        user = await get_user_by_id(uid)
+        
+        if not user:
+            await query.edit_message_caption(
+                caption="❌ User not found or has been deleted.",
+                reply_markup=manage_users_keyboard()
+            )
+            return
+            
+        success = await update_user_repost_interval(phone, next_repost_interval(user.get("repost_interval")))
+        
+        if success:
+            await show_user_details(update, context, uid)
+        else:
+            await query.edit_message_caption(
+                caption=(
+                    f"❌ **Update Failed**\n\n"
+                    f"Could not change re-post interval for `{phone}`.\n"
+                    f"Please check database connection and try again."
+                ),
+                parse_mode="Markdown",
+                reply_markup=InlineKeyboardMarkup([[
+                    InlineKeyboardButton("🔄 Retry", callback_data=f"update_repost_{uid}_{phone}"),
+                    InlineKeyboardButton("⬅️ Back", callback_data=f"userdetails_{uid}")
+                ]])
+            )
+    except Exception as e:
+        print(f"❌ Cycle re-post interval error: {e}")
+        await query.edit_message_caption(
+            caption="❌ System error while changing re-post interval. Please try again.",
+            reply_markup=InlineKeyboardMarkup([[
+                InlineKeyboardButton("⬅️ Back", callback_data=f"userdetails_{uid}")
+            ]])
+        )
+
+
+# ================== CONTENT MODE ==================
+async def cycle_content_mode(update: Update, context: ContextTypes.DEFAULT_TYPE, uid, phone):
+    try:
+        query = update.callback_query
+        user = await get_user_by_id(uid)
+        
+        if not user:
+            await query.edit_message_caption(
+                caption="❌ User not found or has been deleted.",
+                reply_markup=manage_users_keyboard()
+            )
+            return
+            
+        mode, count = next_content_mode(user.get("content_mode"), user.get("content_count"))
+        success = await update_user_content_mode(phone, mode, count)
+        
+        if success:
+            await show_user_details(update, context, uid)
+        else:
+            await query.edit_message_caption(
+                caption=(
+                    f"❌ **Update Failed**\n\n"
+                    f"Could not change forwarded content for `{phone}`.\n"
+                    f"Please check database connection and try again."
+                ),
+                parse_mode="Markdown",
+                reply_markup=InlineKeyboardMarkup([[
+                    InlineKeyboardButton("🔄 Retry", callback_data=f"update_content_{uid}_{phone}"),
+                    InlineKeyboardButton("⬅️ Back", callback_data=f"userdetails_{uid}")
+                ]])
+            )
+    except Exception as e:
+        print(f"❌ Cycle content mode error: {e}")
+        await query.edit_message_caption(
+            caption="❌ System error while changing forwarded content. Please try again.",
+            reply_markup=InlineKeyboardMarkup([[
+                InlineKeyboardButton("⬅️ Back", callback_data=f"userdetails_{uid}")
+            ]])
+        )
+
+
 # ================== UTILITY FUNCTIONS ==================
+CONTENT_MODE_PRESETS = [
+    ("single", 1), ("album", 1), ("recent", 3), ("recent", 5), ("recent", 10), ("marked", 10),
+]
+
+
+def next_content_mode(mode, count):
+    """Next content preset (latest message -> album -> last 3/5/10 -> pinned -> latest message)"""
+    current = (mode or "single", (count or 1) if mode in ("recent", "marked") else 1)
+    if current in CONTENT_MODE_PRESETS:
+        index = CONTENT_MODE_PRESETS.index(current)
+        return CONTENT_MODE_PRESETS[(index + 1) % len(CONTENT_MODE_PRESETS)]
+    return CONTENT_MODE_PRESETS[0]
+
+
+def format_content_display(mode, count=None):
+    """Format forwarded content display"""
+    if mode == "album":
+        return "Latest album (one request)"
+    if mode == "recent":
+        return f"Last {count or 1} messages (one request)"
+    if mode == "marked":
+        return f"Last {count or 1} pinned messages (one request)"
+    return "Latest message"
+
+
+REPOST_INTERVAL_PRESETS = [0, 900, 3600, 6 * 3600, 24 * 3600]
+
+
+def next_repost_interval(current):
+    """Next re-post interval preset (Off -> 15m -> 1h -> 6h -> 24h -> Off)"""
+    current = current or 0
+    for preset in REPOST_INTERVAL_PRESETS:
+        if preset > current:
+            return preset
+    return 0
+
+
+def format_repost_display(seconds):
+    """Format re-post interval display"""
+    if not seconds:
+        return "Always (dedup off)"
+    return f"Same message at most every {format_delay_display(seconds)}"
+
+
+def format_mode_display(mode, max_concurrency=None):
+    """Format forwarding mode display"""
+    if mode == "concurrent":
+        from config import FORWARD_CONCURRENCY
+        return f"Concurrent ({max_concurrency or FORWARD_CONCURRENCY} at a time)"
+    return "Sequential"
+
+
+def format_health_display(records, limit=3):
+    """Format target health summary (quarantined targets first, worst first)"""
+    if not records:
+        return "✅ All healthy"
+    now = datetime.now()
+    quarantined = [r for r in records if r.get('probe_after') and r['probe_after'] > now]
+    failing = len(records) - len(quarantined)
+    parts = []
+    if quarantined:
+        parts.append(f"🚫 {len(quarantined)} quarantined")
+    if failing:
+        parts.append(f"⚠️ {failing} failing")
+    lines = [", ".join(parts)]
+    for record in quarantined[:limit]:
+        target = record['target'] if len(record['target']) <= 40 else record['target'][:37] + "..."
+        lines.append(
+            f"  • `{target}` {record['last_error']} ×{record['failures']}, "
+            f"probe {record['probe_after'].strftime('%d %b %H:%M')}"
+        )
+    return "\n".join(lines)
+
+
 def parse_time_input(time_str):
     """Parse time input string to seconds"""
     time_str = time_str.strip().lower()
@@ -919,10 +1135,10 @@ async def cleanup_on_shutdown():
 
 
 # ================== HEALTH CHECK ==================
-def get_user_management_stats():
+async def get_user_management_stats():
     """Get current user management statistics"""
     try:
-        total_users = get_user_count()
+        total_users = await get_user_count()
         active_states = len(user_edit_states)
         cleanup_tasks = len([t for t in message_cleanup_tasks.values() if not t.done()])
         
@@ -952,6 +1168,9 @@ __all__ = [
     'start_update_delay',
     'start_update_expiry', 
     'toggle_forwarding',
+    'toggle_forward_mode',
+    'cycle_repost_interval',
+    'cycle_content_mode',
     'handle_text_input',
     'handle_user_management_callback',
     'setup_user_management_handlers',